@@ -0,0 +1,53 @@
+"""
+Micro-benchmark for the hashing of flows and illegal flows.
+
+Inserts n distinct values in a set and looks each of them up again, for
+growing n. With a proper hash the time per operation stays flat as n grows.
+
+Usage: python3 benchmarks/flow_hashing.py [n ...]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from domain.Flow import Flow  # noqa: E402
+from domain.IllegalFlow import IllegalFlow  # noqa: E402
+
+
+def make_flows(n):
+    return [Flow([("escape", i), ("clean", i + 1)]) for i in range(n)]
+
+
+def make_illegal_flows(n):
+    flows = make_flows(4)
+    return [
+        IllegalFlow("XSS", "get", i, "mark_safe", i + 1, i % 2 == 0, flows)
+        for i in range(n)
+    ]
+
+
+def measure(values):
+    """
+    Return the time per set insertion and per set lookup, in nanoseconds.
+    """
+    number = 5
+    insertion = timeit.timeit(lambda: set(values), number=number)
+    values_set = set(values)
+    lookup = timeit.timeit(
+        lambda: all(value in values_set for value in values), number=number
+    )
+    ops = number * len(values)
+    return insertion / ops * 1e9, lookup / ops * 1e9
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100, 1000, 10000, 100000]
+
+    print(f"{'type':<12} {'n':>8} {'insert ns/op':>14} {'lookup ns/op':>14}")
+    for name, make in (("Flow", make_flows), ("IllegalFlow", make_illegal_flows)):
+        for n in sizes:
+            insertion, lookup = measure(make(n))
+            print(f"{name:<12} {n:>8} {insertion:>14.1f} {lookup:>14.1f}")
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark for the memory of the domain objects of the analysis.
+
+Allocates n multi-labels, flows, illegal flows and forked states, and
+reports the bytes allocated per object, including the values each one owns
+and not the ones it shares with others, such as the policy.
+
+Usage: python3 benchmarks/memory_footprint.py [n]
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from domain.Flow import Flow  # noqa: E402
+from domain.IllegalFlow import IllegalFlow  # noqa: E402
+from domain.MultiLabel import MultiLabel  # noqa: E402
+from domain.MultiLabelling import MultiLabelling  # noqa: E402
+from domain.Pattern import Pattern  # noqa: E402
+from domain.Policy import Policy  # noqa: E402
+from domain.Vulnerabilities import Vulnerabilities  # noqa: E402
+
+
+def make_multi_labels(n):
+    return [MultiLabel(1 << (i % 64), 1 << (i % 128)) for i in range(n)]
+
+
+def make_flows(n):
+    return [Flow([("escape", i)]) for i in range(n)]
+
+
+def make_illegal_flows(n):
+    flows = [Flow(), Flow([("escape", 1)])]
+    return [
+        IllegalFlow("XSS", "get", i, "mark_safe", i + 1, i % 2 == 0, flows)
+        for i in range(n)
+    ]
+
+
+def make_multilabellings(n):
+    multilabelling = MultiLabelling({"a": MultiLabel(1, 1)})
+    return [multilabelling.fork() for _ in range(n)]
+
+
+def make_states(n):
+    policy = Policy({Pattern("XSS", {"get"}, {"escape"}, {"mark_safe"}, False)})
+    vulnerabilities = Vulnerabilities(policy)
+    vulnerabilities.add_multi_label(MultiLabel(1, 1), "a")
+    return [vulnerabilities.fork() for _ in range(n)]
+
+
+def measure(make, n):
+    """
+    Return the bytes allocated per object by make(n).
+    """
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    values = make(n)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(values) == n
+    return (after - before) / n
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    print(f"{'type':<16} {'n':>8} {'bytes/object':>14}")
+    for name, make in (
+        ("MultiLabel", make_multi_labels),
+        ("Flow", make_flows),
+        ("IllegalFlow", make_illegal_flows),
+        ("MultiLabelling", make_multilabellings),
+        ("Vulnerabilities", make_states),
+    ):
+        print(f"{name:<16} {n:>8} {measure(make, n):>14.1f}")
@@ -0,0 +1,265 @@
+"""
+Benchmark of each stage of the analysis on synthetic slices.
+
+For every combination of the given parameters, a slice and a policy are
+generated and analysed in the "paths" mode one stage at a time: parse,
+branch enumeration, flattening of the paths, uninitialized variable
+detection, labelling and merging of the illegal flows. The whole analyses
+in the "explore" and "fixpoint" modes are measured as two more stages.
+
+Times are the best of --repeat runs. Memory is the peak of the memory
+allocated during each stage, measured with tracemalloc in a separate run,
+as tracing slows the analysis down. The paths are kept between stages, so
+the memory of the later stages includes them, unlike in a normal analysis
+that builds and drops one path at a time.
+
+Each parameter takes a comma separated list of values. The results are
+written as JSON, and can be compared with the results of an earlier run.
+
+Usage: python3 benchmarks/pipeline.py [--statements N,...] [--ifs N,...]
+       [--whiles N,...] [--depth N,...] [--variables N,...]
+       [--patterns N,...] [--repeat N] [--output FILE]
+       [--compare BASELINE] [--threshold RATIO]
+"""
+
+import argparse
+import ast
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from analysis.Analyser import Analyser  # noqa: E402
+from domain.FlowAggregator import FlowAggregator  # noqa: E402
+from domain.Policy import Policy  # noqa: E402
+from domain.Vulnerabilities import Vulnerabilities  # noqa: E402
+from visitors.ControlFlowFlattener import ControlFlowFlattener  # noqa: E402
+from visitors.FixpointProcessor import FixpointProcessor  # noqa: E402
+from visitors.NodeProcessor import NodeProcessor  # noqa: E402
+from visitors.UninitializedVariableDetector import (  # noqa: E402
+    UninitializedVariableDetector,
+)
+
+from slice_generator import generate_patterns, generate_slice  # noqa: E402
+
+PARAMETERS = ("statements", "ifs", "whiles", "depth", "variables", "patterns")
+
+
+def parse(context):
+    context["tree"] = ast.parse(context["source"])
+
+
+def enumerate_branches(context):
+    analyser = Analyser(context["policy"])
+    branch_choices = analyser.get_branch_choices(context["tree"])
+    context["branches"] = list(Analyser.get_branches(branch_choices))
+
+
+def flatten(context):
+    context["paths"] = [
+        ControlFlowFlattener(branch).visit(context["tree"])
+        for branch in context["branches"]
+    ]
+
+
+def detect_uninitialized(context):
+    detectors = []
+    for path in context["paths"]:
+        detector = UninitializedVariableDetector()
+        detector.visit_stmts(path)
+        detectors.append(detector)
+    context["detectors"] = detectors
+
+
+def label(context):
+    vulnerabilities = Vulnerabilities(context["policy"])
+    illegal_flows = []
+    for path, detector in zip(context["paths"], context["detectors"]):
+        path_vulnerabilities = vulnerabilities.fork()
+        NodeProcessor(path_vulnerabilities, detector).visit_stmts(path)
+        illegal_flows.append(path_vulnerabilities.get_illegal_flows())
+    context["illegal_flows"] = illegal_flows
+
+
+def merge(context):
+    flow_aggregator = FlowAggregator()
+    for illegal_flows in context["illegal_flows"]:
+        flow_aggregator.update(illegal_flows)
+    context["output"] = flow_aggregator.get_illegal_flows()
+
+
+def explore(context):
+    Analyser(context["policy"], "explore").analyse(context["tree"])
+
+
+def fixpoint(context):
+    vulnerabilities = Vulnerabilities(context["policy"])
+    FixpointProcessor(vulnerabilities).visit(context["tree"])
+    flow_aggregator = FlowAggregator()
+    flow_aggregator.update(vulnerabilities.get_illegal_flows())
+    flow_aggregator.get_illegal_flows()
+
+
+STAGE_FUNCTIONS = (
+    ("parse", parse),
+    ("branches", enumerate_branches),
+    ("flatten", flatten),
+    ("uninitialized", detect_uninitialized),
+    ("labelling", label),
+    ("merge", merge),
+    ("explore", explore),
+    ("fixpoint", fixpoint),
+)
+
+
+def new_context(params):
+    return {
+        "source": generate_slice(**params),
+        "policy": Policy.from_json(generate_patterns(params["patterns"])),
+    }
+
+
+def measure_times(params, repeat):
+    times = {stage: float("inf") for stage, _ in STAGE_FUNCTIONS}
+    for _ in range(repeat):
+        context = new_context(params)
+        for stage, function in STAGE_FUNCTIONS:
+            start = time.perf_counter()
+            function(context)
+            times[stage] = min(times[stage], time.perf_counter() - start)
+
+    return times, context
+
+
+def measure_memory(params):
+    memory = dict()
+    context = new_context(params)
+    tracemalloc.start()
+    try:
+        for stage, function in STAGE_FUNCTIONS:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            function(context)
+            _, peak = tracemalloc.get_traced_memory()
+            memory[stage] = peak - before
+    finally:
+        tracemalloc.stop()
+
+    return memory
+
+
+def run(params, repeat):
+    times, context = measure_times(params, repeat)
+    memory = measure_memory(params)
+    return {
+        "params": params,
+        "paths": len(context["paths"]),
+        "illegal_flows": len(context["output"]),
+        "stages": {
+            stage: {"time": times[stage], "memory": memory[stage]}
+            for stage, _ in STAGE_FUNCTIONS
+        },
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints and returns the measures that grew by more than the threshold
+    since the baseline
+    """
+    baseline_results = {
+        json.dumps(result["params"], sort_keys=True): result
+        for result in baseline["results"]
+    }
+
+    regressions = []
+    for result in results:
+        key = json.dumps(result["params"], sort_keys=True)
+        if key not in baseline_results:
+            continue
+        for stage, measures in result["stages"].items():
+            baseline_measures = baseline_results[key]["stages"].get(stage)
+            if baseline_measures is None:
+                continue
+            for measure, value in measures.items():
+                baseline_value = baseline_measures[measure]
+                ratio = value / baseline_value if baseline_value > 0 else 1.0
+                if ratio > threshold:
+                    print(f"  {key} {stage} {measure}: {ratio:.2f}x")
+                    regressions.append((key, stage, measure, ratio))
+
+    return regressions
+
+
+def parse_values(values):
+    return [int(value) for value in values.split(",")]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--statements", type=parse_values, default=[20])
+    parser.add_argument("--ifs", type=parse_values, default=[0, 2, 4])
+    parser.add_argument("--whiles", type=parse_values, default=[1])
+    parser.add_argument("--depth", type=parse_values, default=[2])
+    parser.add_argument("--variables", type=parse_values, default=[5])
+    parser.add_argument("--patterns", type=parse_values, default=[2])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", metavar="BASELINE")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="ratio to the baseline above which a measure is a regression",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    results = []
+    header = " ".join(f"{parameter[:5]:>5}" for parameter in PARAMETERS)
+    stages = " ".join(f"{stage[:9]:>9}" for stage, _ in STAGE_FUNCTIONS)
+    print(f"{header} {'paths':>7} {stages}")
+    for values in itertools.product(*(getattr(args, p) for p in PARAMETERS)):
+        params = dict(zip(PARAMETERS, values))
+        result = run(params, args.repeat)
+        results.append(result)
+
+        times = " ".join(
+            f"{result['stages'][stage]['time'] * 1000:>7.1f}ms"
+            for stage, _ in STAGE_FUNCTIONS
+        )
+        columns = " ".join(f"{value:>5}" for value in values)
+        print(f"{columns} {result['paths']:>7} {times}")
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nResults written to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare}:")
+        regressions = compare(results, baseline, args.threshold)
+        if len(regressions) > 0:
+            print(
+                f"\n{len(regressions)} measures regressed by more than "
+                f"{args.threshold:.2f}x"
+            )
+            sys.exit(1)
+        print("No regressions")
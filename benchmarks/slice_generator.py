@@ -0,0 +1,145 @@
+"""
+Generator of synthetic slices and policies for the benchmarks.
+
+A slice has a number of simple statements (assignments and calls), some of
+them inside if and while statements, over a pool of variables. Expressions
+are nested up to a given depth, and call the sources, sanitizers and sinks
+of the generated patterns.
+
+Usage: python3 benchmarks/slice_generator.py <slice>.py <patterns>.json
+       [--statements N] [--ifs N] [--whiles N] [--depth N] [--variables N]
+       [--patterns N] [--seed N]
+"""
+
+import argparse
+import json
+import random
+
+
+def source_name(pattern):
+    return f"source{pattern}"
+
+
+def sanitizer_name(pattern):
+    return f"sanitize{pattern}"
+
+
+def sink_name(pattern):
+    return f"sink{pattern}"
+
+
+def generate_patterns(patterns):
+    return [
+        {
+            "vulnerability": f"V{i}",
+            "sources": [source_name(i), f"w{i}"],
+            "sanitizers": [sanitizer_name(i)],
+            "sinks": [sink_name(i)],
+            "implicit": "no",
+        }
+        for i in range(patterns)
+    ]
+
+
+class SliceGenerator:
+    def __init__(self, depth, variables, patterns, seed):
+        self.depth = depth
+        self.variables = [f"v{i}" for i in range(variables)]
+        self.patterns = patterns
+        self.random = random.Random(seed)
+
+    def variable(self):
+        return self.random.choice(self.variables)
+
+    def pattern(self):
+        return self.random.randrange(self.patterns)
+
+    def expression(self, depth):
+        if depth == 0:
+            choice = self.random.random()
+            if choice < 0.2:
+                return f"{source_name(self.pattern())}()"
+            if choice < 0.3:
+                return str(self.random.randrange(100))
+            return self.variable()
+
+        choice = self.random.random()
+        if choice < 0.4:
+            left = self.expression(depth - 1)
+            right = self.expression(self.random.randrange(depth))
+            return f"{left} + {right}"
+        if choice < 0.7:
+            return f"{sanitizer_name(self.pattern())}({self.expression(depth - 1)})"
+        return f"f{self.random.randrange(3)}({self.expression(depth - 1)})"
+
+    def statement(self):
+        if self.random.random() < 0.25:
+            return f"{sink_name(self.pattern())}({self.expression(self.depth)})"
+        return f"{self.variable()} = {self.expression(self.depth)}"
+
+    def generate(self, statements, ifs, whiles):
+        """
+        Returns the lines of a slice. Each if and while statement holds one
+        of the simple statements in its body, and each if statement one more
+        in its else branch.
+        """
+        blocks = ["if"] * ifs + ["while"] * whiles
+        simple = max(0, statements - 2 * ifs - whiles)
+        blocks += ["stmt"] * simple
+        self.random.shuffle(blocks)
+
+        lines = []
+        for block in blocks:
+            if block == "stmt":
+                lines.append(self.statement())
+            else:
+                lines.append(f"{block} {self.expression(0)}:")
+                lines.append("    " + self.statement())
+                if block == "if":
+                    lines.append("else:")
+                    lines.append("    " + self.statement())
+
+        # every pattern has a sink reached by every variable
+        for i in range(self.patterns):
+            lines.append(f"{sink_name(i)}({' + '.join(self.variables)})")
+
+        return lines
+
+
+def generate_slice(
+    statements=20, ifs=2, whiles=1, depth=2, variables=5, patterns=2, seed=0
+):
+    generator = SliceGenerator(depth, variables, patterns, seed)
+    return "\n".join(generator.generate(statements, ifs, whiles)) + "\n"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("slice")
+    parser.add_argument("patterns_file")
+    parser.add_argument("--statements", type=int, default=20)
+    parser.add_argument("--ifs", type=int, default=2)
+    parser.add_argument("--whiles", type=int, default=1)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--variables", type=int, default=5)
+    parser.add_argument("--patterns", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with open(args.slice, "w") as f:
+        f.write(
+            generate_slice(
+                args.statements,
+                args.ifs,
+                args.whiles,
+                args.depth,
+                args.variables,
+                args.patterns,
+                args.seed,
+            )
+        )
+    with open(args.patterns_file, "w") as f:
+        f.write(json.dumps(generate_patterns(args.patterns), indent=4) + "\n")
@@ -0,0 +1,314 @@
+import ast
+import copy
+import functools
+import glob
+import hashlib
+import itertools
+import math
+import os
+
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from domain.FlowAggregator import FlowAggregator, OnFinal
+from domain.IllegalFlow import IllegalFlow
+from domain.MultiLabel import MultiLabel
+from domain.Policy import Policy
+from domain.Vulnerabilities import Vulnerabilities
+
+from visitors.ControlFlowFlattener import ControlFlowFlattener
+from visitors.ControlFlowNodeCounter import ControlFlowNodeCounter
+from visitors.FixpointProcessor import FixpointProcessor
+from visitors.IrrelevantBlockDetector import IrrelevantBlockDetector
+from visitors.NodeProcessor import NodeProcessor
+from visitors.UninitializedVariableDetector import UninitializedVariableDetector
+
+from analysis.AnalysisBudget import AnalysisBudget
+from analysis.AnalysisStats import AnalysisStats
+from analysis.PathExplorer import PathExplorer
+
+
+class Analyser:
+    """
+    Finds the illegal flows encoded by a slice according to a policy.
+
+    In the "paths" mode every combination of branches of the if and while
+    statements is analysed separately. The "explore" mode finds the same
+    illegal flows by exploring the paths depth-first, analysing the
+    statements they share once. In the "fixpoint" mode the slice is
+    analysed once, joining the branches of each control flow statement. It
+    over-approximates the "paths" mode: it finds all of its illegal flows,
+    but may find more sanitized flows, and sources and sinks that no
+    combination of branches connects.
+
+    Control flow statements whose branches cannot change the illegal flows
+    only take their else branch, so they do not multiply the paths.
+
+    The time of each stage and the counts of events of the last analysis are
+    kept in its stats. With a budget, the analysis stops when the budget is
+    exhausted, and its stats are marked as partial.
+
+    The "explore" and "fixpoint" modes pass the merged illegal flows to
+    on_final as soon as they are final, before the analysis ends.
+    """
+
+    MODES = ("paths", "explore", "fixpoint")
+
+    # packages whose code can change the results of an analysis
+    PACKAGES = ("domain", "visitors", "analysis")
+
+    # take the else branch, or the body once (if) or one to three times (while)
+    BRANCH_CHOICES = [(False, 1)] + [(True, i + 1) for i in range(3)]
+
+    def __init__(
+        self,
+        policy: Policy,
+        mode: str = "paths",
+        budget: Optional[AnalysisBudget] = None,
+    ) -> None:
+        if mode not in Analyser.MODES:
+            raise ValueError(f"Unknown analysis mode: {mode}")
+        self.policy = policy
+        self.mode = mode
+        self.budget = budget
+        self.stats = AnalysisStats()
+        self.on_final: Optional[OnFinal] = None
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def get_version() -> str:
+        """
+        Identifies the code of the analyser by a hash of its packages, so
+        that results kept by another version of the code are not reused
+        """
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        digest = hashlib.sha256()
+        for package in Analyser.PACKAGES:
+            for module_path in sorted(
+                glob.glob(os.path.join(src_dir, package, "*.py"))
+            ):
+                digest.update(os.path.relpath(module_path, src_dir).encode())
+                with open(module_path, "rb") as f:
+                    digest.update(f.read())
+
+        return digest.hexdigest()
+
+    def with_policy(self, policy: Policy) -> "Analyser":
+        """
+        Returns an analyser with the same settings for another policy
+        """
+        analyser = copy.copy(self)
+        analyser.policy = policy
+        return analyser
+
+    def analyse(
+        self,
+        tree: ast.Module,
+        stats: Optional[AnalysisStats] = None,
+        on_final: Optional[OnFinal] = None,
+    ) -> List[IllegalFlow]:
+        """
+        Returns the illegal flows of a slice, recording the stages of the
+        analysis in the given stats, or in new ones. The illegal flows that
+        are final before the analysis ends are also passed to on_final.
+        """
+        self.stats = stats if stats is not None else AnalysisStats()
+        self.on_final = on_final
+        combines = MultiLabel.calls["combine"]
+        if self.budget is not None:
+            self.budget.start()
+
+        if self.mode == "fixpoint":
+            flow_aggregator = self.analyse_fixpoint(tree)
+        elif self.mode == "explore":
+            flow_aggregator = self.analyse_explore(tree)
+        else:
+            flow_aggregator = self.analyse_paths(tree)
+
+        with self.stats.measure("merge"):
+            illegal_flows = flow_aggregator.get_illegal_flows()
+
+        self.stats.count("illegal_flows", len(illegal_flows))
+        self.stats.count("multi_label_combines", MultiLabel.calls["combine"] - combines)
+        return illegal_flows
+
+    def __getstate__(self):
+        # the receiver of the final illegal flows of an analysis is not kept
+        state = self.__dict__.copy()
+        state["on_final"] = None
+        return state
+
+    def analyse_paths(self, tree: ast.Module) -> FlowAggregator:
+        with self.stats.measure("branches"):
+            branch_choices = self.get_branch_choices(tree)
+        return self.analyse_branches(tree, branch_choices)
+
+    def analyse_branches(
+        self, tree: ast.Module, branch_choices: List[List[Tuple[bool, int]]]
+    ) -> FlowAggregator:
+        self.stats.count("total_paths", Analyser.count_paths(branch_choices))
+        branches = Analyser.get_branches(branch_choices)
+
+        flow_aggregator = FlowAggregator()
+        for illegal_flows in self.iter_paths(tree, branches):
+            with self.stats.measure("merge"):
+                flow_aggregator.update(illegal_flows)
+
+        return flow_aggregator
+
+    def analyse_explore(self, tree: ast.Module) -> FlowAggregator:
+        if not PathExplorer.can_explore(tree):
+            # the paths of other slices are only defined by their enumeration
+            return self.analyse_paths(tree)
+
+        self.stats.count(
+            "total_paths",
+            len(Analyser.BRANCH_CHOICES) ** Analyser.count_control_flow_nodes(tree),
+        )
+        path_explorer = PathExplorer(
+            self.policy,
+            Analyser.BRANCH_CHOICES,
+            self.stats,
+            self.budget,
+            self.get_irrelevant_blocks(tree),
+            self.on_final,
+        )
+        return path_explorer.explore(tree)
+
+    @staticmethod
+    def count_control_flow_nodes(tree: ast.Module) -> int:
+        control_flow_node_counter = ControlFlowNodeCounter()
+        control_flow_node_counter.visit(tree)
+
+        return control_flow_node_counter.get_count()
+
+    def get_irrelevant_blocks(self, tree: ast.Module) -> Set[ast.stmt]:
+        irrelevant_block_detector = IrrelevantBlockDetector(self.policy)
+        irrelevant_block_detector.visit(tree)
+        irrelevant_blocks = irrelevant_block_detector.get_irrelevant_blocks()
+
+        self.stats.count("irrelevant_blocks", len(irrelevant_blocks))
+        return irrelevant_blocks
+
+    def get_branch_choices(self, tree: ast.Module) -> List[List[Tuple[bool, int]]]:
+        """
+        Returns the choices of branches of each position of the combinations
+        of branches. Irrelevant control flow statements only take their else
+        branch, unless the positions of the statements are unknown because
+        some are not where the flattener expects them.
+        """
+        count = Analyser.count_control_flow_nodes(tree)
+        nodes = ControlFlowFlattener.get_control_flow_nodes(tree.body)
+        if len(nodes) != count:
+            return [Analyser.BRANCH_CHOICES] * count
+
+        irrelevant_blocks = self.get_irrelevant_blocks(tree)
+        return [
+            [(False, 1)] if node in irrelevant_blocks else Analyser.BRANCH_CHOICES
+            for node in nodes
+        ]
+
+    @staticmethod
+    def count_paths(branch_choices: Sequence[Sequence[Tuple[bool, int]]]) -> int:
+        return math.prod(len(choices) for choices in branch_choices)
+
+    @staticmethod
+    def get_branches(
+        branch_choices: Sequence[Sequence[Tuple[bool, int]]],
+        prefix: Tuple[Tuple[bool, int], ...] = (),
+    ) -> Iterator[Tuple[Tuple[bool, int], ...]]:
+        """
+        Lazily generates the combinations of branches that start with the
+        given prefix.
+        """
+        suffixes = itertools.product(*branch_choices[len(prefix) :])
+        return (prefix + suffix for suffix in suffixes)
+
+    def iter_paths(
+        self,
+        tree: ast.Module,
+        branches: Iterable[Tuple[Tuple[bool, int], ...]],
+        max_paths: Optional[int] = None,
+    ) -> Iterator[Set[IllegalFlow]]:
+        """
+        Lazily analyses each combination of branches, yielding the illegal
+        flows of one path before the next path is built. Paths share the
+        nodes of the tree, which is never copied.
+
+        Stops when the budget of the analyser, with at most max_paths paths
+        if given, is exhausted.
+        """
+        vulnerabilities = Vulnerabilities(self.policy)
+        if self.budget is not None and max_paths is None:
+            max_paths = self.budget.max_paths
+
+        for paths, branch in enumerate(branches):
+            if self.budget is not None:
+                reason = self.budget.check(paths, max_paths)
+                if reason is not None:
+                    self.stats.stop(reason)
+                    return
+
+            # Replace if and while statements by the chosen branches
+            with self.stats.measure("flatten"):
+                control_flow_flattener = ControlFlowFlattener(branch)
+                path = control_flow_flattener.visit(tree)
+
+            # Find uninitialized variables
+            with self.stats.measure("uninitialized"):
+                uninitialized_variable_detector = UninitializedVariableDetector()
+                uninitialized_variable_detector.visit_stmts(path)
+
+            # Find illegal flows
+            with self.stats.measure("labelling"):
+                path_vulnerabilities = vulnerabilities.fork()
+                node_processor = NodeProcessor(
+                    path_vulnerabilities, uninitialized_variable_detector
+                )
+                node_processor.visit_stmts(path)
+
+            illegal_flows = path_vulnerabilities.get_illegal_flows()
+            self.count_path(illegal_flows)
+            yield illegal_flows
+
+    def count_path(self, illegal_flows: Set[IllegalFlow]) -> None:
+        self.stats.count("paths")
+        self.stats.count("illegal_flows_found", len(illegal_flows))
+        for illegal_flow in illegal_flows:
+            # flows of the label of the source that reached the sink
+            self.stats.observe("sink_label_flows", len(illegal_flow.sanitized_flows))
+
+    def analyse_fixpoint(self, tree: ast.Module) -> FlowAggregator:
+        self.stats.count("total_statements", len(tree.body))
+
+        fixpoint_processor = FixpointProcessor(Vulnerabilities(self.policy))
+        flow_aggregator = FlowAggregator(self.on_final)
+        illegal_flows: Set[IllegalFlow] = set()
+        for statements, stmt in enumerate(tree.body):
+            if self.budget is not None:
+                # the budget of paths does not apply to a single pass
+                reason = self.budget.check(statements, None)
+                if reason is not None:
+                    self.stats.stop(reason)
+                    break
+
+            # each statement collects its own illegal flows, which are final
+            # once the statements that follow it start
+            vulnerabilities = fixpoint_processor.vulnerabilities
+            fixpoint_processor.vulnerabilities = Vulnerabilities(
+                self.policy,
+                vulnerabilities.get_multilabelling(),
+                vulnerabilities.get_label_encoding(),
+            )
+            with self.stats.measure("labelling"):
+                fixpoint_processor.visit_stmts([stmt])
+            self.stats.count("statements")
+
+            stmt_illegal_flows = fixpoint_processor.vulnerabilities.get_illegal_flows()
+            illegal_flows |= stmt_illegal_flows
+            with self.stats.measure("merge"):
+                flow_aggregator.update(stmt_illegal_flows)
+                if statements + 1 < len(tree.body):
+                    flow_aggregator.finalize(tree.body[statements + 1].lineno)
+
+        self.count_path(illegal_flows)
+        return flow_aggregator
@@ -0,0 +1,92 @@
+import resource
+import sys
+import time
+
+from typing import Optional
+
+
+class AnalysisBudget:
+    """
+    Limits on the number of paths, the time and the memory of the analysis
+    of a slice. When a limit is reached, the analysis stops and returns the
+    illegal flows found until then.
+
+    The memory is the resident memory of the process, which is checked every
+    MEMORY_CHECK_INTERVAL paths, as reading it is slower than the other
+    checks.
+    """
+
+    MEMORY_CHECK_INTERVAL = 16
+
+    def __init__(
+        self,
+        max_paths: Optional[int] = None,
+        max_time: Optional[float] = None,
+        max_memory: Optional[int] = None,
+    ) -> None:
+        self.max_paths = max_paths
+        self.max_time = max_time
+        self.max_memory = max_memory
+
+        self.deadline: Optional[float] = None
+
+    def start(self) -> None:
+        """
+        Starts the time budget of an analysis
+        """
+        if self.max_time is not None:
+            self.deadline = time.monotonic() + self.max_time
+
+    @staticmethod
+    def until(
+        budget: Optional["AnalysisBudget"], deadline: Optional[float]
+    ) -> Optional["AnalysisBudget"]:
+        """
+        Returns a new budget with the limits of budget, if any, for an analysis
+        that must end by the deadline, in seconds since the epoch, if any
+        """
+        if budget is None:
+            if deadline is None:
+                return None
+            budget = AnalysisBudget()
+
+        max_time = budget.max_time
+        if deadline is not None:
+            remaining = deadline - time.time()
+            max_time = remaining if max_time is None else min(max_time, remaining)
+        return AnalysisBudget(budget.max_paths, max_time, budget.max_memory)
+
+    @staticmethod
+    def get_memory() -> int:
+        """
+        Returns the resident memory of the process in bytes, or its peak if
+        the current one is not available
+        """
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * resource.getpagesize()
+        except (OSError, ValueError, IndexError):
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # in kilobytes on Linux and in bytes on macOS
+            return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+    def check(self, paths: int, max_paths: Optional[int]) -> Optional[str]:
+        """
+        Returns the reason to stop the analysis after the given number of
+        paths, or None if it is within the budget. The path budget is given
+        separately, as it can be a share of max_paths or not apply at all.
+        """
+        if max_paths is not None and paths >= max_paths:
+            return f"path budget of {self.max_paths} paths exhausted"
+
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            return f"time budget of {self.max_time}s exhausted"
+
+        if (
+            self.max_memory is not None
+            and paths % AnalysisBudget.MEMORY_CHECK_INTERVAL == 0
+            and AnalysisBudget.get_memory() > self.max_memory
+        ):
+            return f"memory budget of {self.max_memory // 2**20}MB exhausted"
+
+        return None
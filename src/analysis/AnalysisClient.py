@@ -0,0 +1,72 @@
+import json
+import socket
+
+from typing import Dict, List, Optional, Tuple
+
+from domain.IllegalFlow import IllegalFlow
+
+
+class AnalysisClient:
+    """
+    Client of an analysis server, connected to a Unix socket or to host:port
+    """
+
+    def __init__(self, address: str) -> None:
+        if ":" in address:
+            host, port = address.rsplit(":", 1)
+            self.socket = socket.create_connection((host, int(port)))
+        else:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(address)
+        self.file = self.socket.makefile("rwb")
+        self.next_id = 0
+
+    def call(self, method: str, **params) -> Dict:
+        """
+        Sends a request and returns the response, or raises RuntimeError with
+        the message of its error
+        """
+        self.next_id += 1
+        request = {
+            "jsonrpc": "2.0",
+            "id": self.next_id,
+            "method": method,
+            "params": params,
+        }
+        self.file.write(json.dumps(request).encode() + b"\n")
+        self.file.flush()
+
+        line = self.file.readline()
+        if line == b"":
+            raise ConnectionError("Analysis server closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"]["message"])
+
+        return response
+
+    def load_policy(self, patterns: List[Dict]) -> str:
+        return self.call("load_policy", patterns=patterns)["result"]
+
+    def analyse(
+        self,
+        policy_id: str,
+        source: Optional[str] = None,
+        path: Optional[str] = None,
+        mode: str = "paths",
+    ) -> Tuple[List[IllegalFlow], Optional[str]]:
+        """
+        Returns the illegal flows of a slice and the reason its analysis
+        stopped early, if it did
+        """
+        response = self.call(
+            "analyse", policy_id=policy_id, source=source, path=path, mode=mode
+        )
+        illegal_flows = [
+            IllegalFlow.from_json(illegal_flow) for illegal_flow in response["result"]
+        ]
+        return illegal_flows, response.get("partial")
+
+    def close(self) -> None:
+        self.file.close()
+        self.socket.close()
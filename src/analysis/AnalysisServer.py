@@ -0,0 +1,243 @@
+import ast
+import inspect
+import json
+import os
+import socketserver
+import stat
+import threading
+import time
+
+from typing import Dict, List, Optional, Tuple
+
+from domain.Policy import Policy
+
+from analysis.Analyser import Analyser
+from analysis.AnalysisBudget import AnalysisBudget
+from analysis.AnalysisStats import AnalysisStats
+from analysis.ResultCache import ResultCache
+
+
+class AnalysisRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers the requests of a client, one JSON object per line
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if line.strip() == b"":
+                continue
+            response = self.server.analysis_server.handle_request(line)
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class ThreadingUnixStreamServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    analysis_server: "AnalysisServer"
+
+
+class ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    analysis_server: "AnalysisServer"
+
+
+class AnalysisServer:
+    """
+    Long-running analyser that keeps policies loaded between requests.
+
+    Clients connect to a Unix socket, or to host:port over TCP, and send
+    JSON-RPC requests, one per line. Policies are loaded once with
+    "load_policy", which returns the id of the policy, and slices are
+    analysed with "analyse", which returns their illegal flows. Each client
+    is served by its own thread.
+
+    Each analysis has its own budget, whose time ends after the timeout, and
+    the response of an analysis stopped by its budget has a "partial" member
+    with the reason.
+
+    Slices are sent by their source, or by their path if the server has a
+    slice root, which the paths must stay within, so that clients cannot
+    read other files.
+    """
+
+    # JSON-RPC error codes
+    PARSE_ERROR = -32700
+    INVALID_REQUEST = -32600
+    METHOD_NOT_FOUND = -32601
+    INVALID_PARAMS = -32602
+    ANALYSIS_ERROR = -32000
+
+    METHODS = ("load_policy", "analyse")
+
+    def __init__(
+        self,
+        address: str,
+        slice_root: Optional[str] = None,
+        budget: Optional[AnalysisBudget] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.address = address
+        self.slice_root = slice_root
+        self.budget = budget
+        self.timeout = timeout
+        self.policies: Dict[str, Policy] = dict()
+        self.lock = threading.Lock()
+        self.server: Optional[socketserver.BaseServer] = None
+
+    def load_policy(self, patterns: List[Dict]) -> str:
+        """
+        Loads a policy and returns its id, which is the same for the same
+        patterns, so a policy that is already loaded is not parsed again
+        """
+        policy_id = ResultCache.hash_parts(json.dumps(patterns, sort_keys=True))
+        with self.lock:
+            if policy_id in self.policies:
+                return policy_id
+
+        policy = Policy.from_json(patterns)
+        with self.lock:
+            self.policies.setdefault(policy_id, policy)
+
+        return policy_id
+
+    @staticmethod
+    def read_slice(slice_root: Optional[str], path: str) -> str:
+        """
+        Returns the source of the slice at a path relative to the slice root.
+
+        Raises ValueError if there is no slice root or if the path, with its
+        symbolic links resolved, is outside it.
+        """
+        if slice_root is None:
+            raise ValueError("Slices must be sent by source without a slice root")
+        root = os.path.realpath(slice_root)
+        slice_path = os.path.realpath(os.path.join(root, path))
+        if os.path.commonpath([root, slice_path]) != root:
+            raise ValueError(f"Slice path outside the slice root: {path}")
+        with open(slice_path, "r") as f:
+            return f.read()
+
+    @staticmethod
+    def remove_socket(address: str) -> None:
+        """
+        Removes the Unix socket at address, left by a previous server.
+
+        Raises FileExistsError if address is another kind of file, which is
+        never removed.
+        """
+        try:
+            mode = os.lstat(address).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"{address} exists and is not a socket")
+        os.remove(address)
+
+    def analyse(
+        self,
+        policy_id: str,
+        source: Optional[str] = None,
+        path: Optional[str] = None,
+        mode: str = "paths",
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Analyses a slice, given by its source or its path relative to the
+        slice root, with a loaded policy, and returns its illegal flows and the
+        reason its analysis stopped early, if it did
+        """
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.time() + self.timeout
+
+        with self.lock:
+            policy = self.policies.get(policy_id)
+        if policy is None:
+            raise ValueError(f"Unknown policy: {policy_id}")
+
+        if source is None:
+            if path is None:
+                raise ValueError("Either source or path is required")
+            source = AnalysisServer.read_slice(self.slice_root, path)
+
+        budget = AnalysisBudget.until(self.budget, deadline)
+        stats = AnalysisStats()
+        illegal_flows = Analyser(policy, mode, budget).analyse(ast.parse(source), stats)
+        return [illegal_flow.to_json() for illegal_flow in illegal_flows], stats.partial
+
+    @staticmethod
+    def error_response(request_id, code: int, message: str) -> Dict:
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {"code": code, "message": message},
+        }
+
+    def handle_request(self, line: bytes) -> Dict:
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return AnalysisServer.error_response(
+                None, AnalysisServer.PARSE_ERROR, str(e)
+            )
+
+        if not isinstance(request, dict) or "method" not in request:
+            return AnalysisServer.error_response(
+                None, AnalysisServer.INVALID_REQUEST, "Invalid request"
+            )
+
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params", dict())
+        if method not in AnalysisServer.METHODS:
+            return AnalysisServer.error_response(
+                request_id, AnalysisServer.METHOD_NOT_FOUND, f"Unknown method: {method}"
+            )
+        if not isinstance(params, dict):
+            return AnalysisServer.error_response(
+                request_id, AnalysisServer.INVALID_PARAMS, "Params must be an object"
+            )
+
+        handler = getattr(self, method)
+        try:
+            inspect.signature(handler).bind(**params)
+        except TypeError as e:
+            return AnalysisServer.error_response(
+                request_id, AnalysisServer.INVALID_PARAMS, str(e)
+            )
+
+        try:
+            result = handler(**params)
+        except Exception as e:
+            return AnalysisServer.error_response(
+                request_id, AnalysisServer.ANALYSIS_ERROR, f"{type(e).__name__}: {e}"
+            )
+
+        response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        if method == "analyse":
+            response["result"], partial = result
+            if partial is not None:
+                response["partial"] = partial
+        return response
+
+    def serve_forever(self) -> None:
+        if ":" in self.address:
+            host, port = self.address.rsplit(":", 1)
+            self.server = ThreadingTCPServer((host, int(port)), AnalysisRequestHandler)
+        else:
+            AnalysisServer.remove_socket(self.address)
+            self.server = ThreadingUnixStreamServer(
+                self.address, AnalysisRequestHandler
+            )
+
+        self.server.analysis_server = self
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if ":" not in self.address:
+                AnalysisServer.remove_socket(self.address)
+
+    def shutdown(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
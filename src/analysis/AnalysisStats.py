@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+import time
+import tracemalloc
+
+from typing import Dict, Iterator, Optional
+
+
+class AnalysisStats:
+    """
+    Time, allocations and event counts of the analysis of a slice.
+
+    The time of each stage and the counters are cheap to keep, so they are
+    always recorded. The memory allocated in each stage is only measured
+    while tracemalloc is tracing, as tracing slows the analysis down.
+
+    An analysis stopped by its budget is partial, and its coverage is the
+    fraction of the paths, or of the top-level statements in the "fixpoint"
+    mode, that were analysed.
+    """
+
+    def __init__(self) -> None:
+        # total time spent in each stage
+        self.times: Dict[str, float] = dict()
+        # largest peak of memory allocated in one run of each stage
+        self.memory: Dict[str, int] = dict()
+        self.counters: Dict[str, int] = dict()
+        self.maxima: Dict[str, int] = dict()
+        # reason the analysis stopped before its end
+        self.partial: Optional[str] = None
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[stage] = self.times.get(stage, 0.0) + (
+                time.perf_counter() - start
+            )
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                self.memory[stage] = max(self.memory.get(stage, 0), peak - before)
+
+    def count(self, counter: str, n: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def observe(self, counter: str, value: int) -> None:
+        """
+        Counts a value, keeping their total and their maximum
+        """
+        self.count(counter, value)
+        self.maxima[counter] = max(self.maxima.get(counter, 0), value)
+
+    def stop(self, reason: str) -> None:
+        self.partial = reason
+
+    def is_partial(self) -> bool:
+        return self.partial is not None
+
+    def get_coverage(self) -> float:
+        for done, total in (
+            ("paths", "total_paths"),
+            ("statements", "total_statements"),
+        ):
+            if self.counters.get(total, 0) > 0:
+                return self.counters.get(done, 0) / self.counters[total]
+        return 0.0 if self.is_partial() else 1.0
+
+    def merge(self, other: "AnalysisStats") -> None:
+        if self.partial is None:
+            self.partial = other.partial
+        for stage, elapsed in other.times.items():
+            self.times[stage] = self.times.get(stage, 0.0) + elapsed
+        for stage, memory in other.memory.items():
+            self.memory[stage] = max(self.memory.get(stage, 0), memory)
+        for counter, n in other.counters.items():
+            self.count(counter, n)
+        for counter, value in other.maxima.items():
+            self.maxima[counter] = max(self.maxima.get(counter, 0), value)
+
+    def to_json(self) -> Dict:
+        stages = dict()
+        for stage, elapsed in self.times.items():
+            stages[stage] = {"time": elapsed}
+            if stage in self.memory:
+                stages[stage]["memory"] = self.memory[stage]
+
+        return {
+            "partial": self.partial,
+            "coverage": self.get_coverage(),
+            "stages": stages,
+            "counters": dict(self.counters),
+            "maxima": dict(self.maxima),
+        }
@@ -0,0 +1,453 @@
+import ast
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import json
+import math
+import os
+import time
+
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from domain.Policy import Policy
+
+from analysis.AnalysisBudget import AnalysisBudget
+from analysis.AnalysisServer import AnalysisServer
+from analysis.AnalysisStats import AnalysisStats
+from analysis.Analyser import Analyser
+
+
+# illegal flows of a slice, or the error that prevented its analysis, and the
+# reason the analysis stopped early if it did
+SliceResult = Tuple[Optional[List[Dict]], Optional[str], Optional[str]]
+
+
+class AsyncAnalysisService:
+    """
+    Analyses slices submitted concurrently from an asyncio event loop.
+
+    Submitted slices wait in a bounded queue, and are taken from it in
+    micro-batches, at most one per worker in flight. Each batch is sent to a
+    pool of worker processes as a single task, which analyses its slices from
+    the cheapest one and returns their results together. While workers are
+    idle, the waiting slices are shared between them instead of waiting to
+    fill a batch. When the queue is full, submitting waits, and at most
+    max_concurrency slices are pending at a time. Each request is answered as
+    soon as its batch is done.
+
+    A request that is not answered within the timeout fails. The slices of a
+    batch must be analysed by RESULT_MARGIN seconds before the first of their
+    requests fails, and share the time left until then as the time budgets of
+    their analyses, so slow slices are stopped early rather than making the
+    rest of their batch fail, and the workers do not go on analysing slices
+    nobody waits for. A pool broken by a crashed worker is replaced.
+    """
+
+    # latencies kept for the percentiles
+    MAX_LATENCIES = 10000
+
+    # seconds left to return the results of a batch before its requests fail
+    RESULT_MARGIN = 0.05
+
+    # analyser of the service and its budget, set in each worker process
+    worker: Optional[Tuple[Analyser, Optional[AnalysisBudget]]] = None
+
+    def __init__(
+        self,
+        policy: Policy,
+        mode: str = "paths",
+        jobs: Optional[int] = None,
+        batch_size: int = 16,
+        batch_delay: float = 0.005,
+        max_queue: int = 256,
+        max_concurrency: int = 1024,
+        timeout: Optional[float] = None,
+        budget: Optional[AnalysisBudget] = None,
+        slice_root: Optional[str] = None,
+    ) -> None:
+        self.policy = policy
+        self.mode = mode
+        self.budget = budget
+        self.slice_root = slice_root
+        self.jobs = jobs or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_queue = max_queue
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+        self.latencies: Deque[float] = deque(maxlen=AsyncAnalysisService.MAX_LATENCIES)
+        self.requests = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.partial = 0
+        self.restarts = 0
+        # batches being analysed
+        self.running = 0
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.concurrency: Optional[asyncio.Semaphore] = None
+        self.batches: Optional[asyncio.Semaphore] = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.batcher: Optional[asyncio.Task] = None
+        self.batch_tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def init_worker(
+        policy: Policy, mode: str, budget: Optional[AnalysisBudget]
+    ) -> None:
+        AsyncAnalysisService.worker = (Analyser(policy, mode), budget)
+
+    @staticmethod
+    def analyse_batch(batch: List[Tuple[str, Optional[float]]]) -> List[SliceResult]:
+        """
+        Returns the results of the slices of a batch, given by their source and
+        the deadline of their request, in seconds since the epoch
+        """
+        assert AsyncAnalysisService.worker is not None
+        analyser, budget = AsyncAnalysisService.worker
+
+        results: List[SliceResult] = [(None, None, None)] * len(batch)
+        trees = []
+        for i, (source, _) in enumerate(batch):
+            try:
+                tree = ast.parse(source)
+            except SyntaxError as e:
+                results[i] = (None, f"SyntaxError: {e}", None)
+                continue
+            cost = (Analyser.count_control_flow_nodes(tree), len(source))
+            trees.append((cost, i, tree))
+
+        deadlines = [deadline for _, deadline in batch if deadline is not None]
+        end = None
+        if len(deadlines) > 0:
+            end = min(deadlines) - AsyncAnalysisService.RESULT_MARGIN
+
+        trees.sort(key=lambda item: item[:2])
+        for n, (_, i, tree) in enumerate(trees):
+            # the requests of the batch fail before this slice could be analysed
+            now = time.time()
+            if end is not None and now >= end:
+                results[i] = (None, "timed out before its analysis started", None)
+                continue
+
+            # the slices left share the time left, and the cheap ones leave
+            # most of their share to the next ones
+            slice_end = None
+            if end is not None:
+                slice_end = now + (end - now) / (len(trees) - n)
+            analyser.budget = AnalysisBudget.until(budget, slice_end)
+            stats = AnalysisStats()
+            try:
+                illegal_flows = analyser.analyse(tree, stats)
+            except Exception as e:
+                results[i] = (None, f"{type(e).__name__}: {e}", None)
+                continue
+            illegal_flows_json = [
+                illegal_flow.to_json() for illegal_flow in illegal_flows
+            ]
+            results[i] = (illegal_flows_json, None, stats.partial)
+
+        return results
+
+    def make_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self.jobs,
+            initializer=AsyncAnalysisService.init_worker,
+            initargs=(self.policy, self.mode, self.budget),
+        )
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.concurrency = asyncio.Semaphore(self.max_concurrency)
+        # batches being analysed, at most one per worker
+        self.batches = asyncio.Semaphore(self.jobs)
+        self.executor = self.make_executor()
+        self.batcher = asyncio.create_task(self.run_batcher())
+
+    async def close(self) -> None:
+        if self.batcher is not None:
+            self.batcher.cancel()
+            try:
+                await self.batcher
+            except asyncio.CancelledError:
+                pass
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def __aenter__(self) -> "AsyncAnalysisService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def run_batcher(self) -> None:
+        assert self.queue is not None
+        assert self.batches is not None
+        while True:
+            await self.batches.acquire()
+            batch = [await self.queue.get()]
+
+            # wait briefly for more slices to fill the batch, unless other
+            # workers are idle and can take a share of the waiting slices
+            idle = self.jobs - self.running
+            deadline = time.perf_counter() + self.batch_delay
+            while len(batch) < self.batch_size:
+                waiting = len(batch) + self.queue.qsize()
+                if idle > 1 and len(batch) >= math.ceil(waiting / idle):
+                    break
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        item = await asyncio.wait_for(self.queue.get(), remaining)
+                    else:
+                        item = self.queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                batch.append(item)
+
+            self.running += 1
+            task = asyncio.create_task(self.run_batch(batch))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+
+    async def run_batch(
+        self, batch: List[Tuple[str, asyncio.Future, Optional[float]]]
+    ) -> None:
+        assert self.batches is not None
+        try:
+            # slices whose requests timed out are not analysed
+            pending = [item for item in batch if not item[1].done()]
+            if len(pending) > 0:
+                results = await self.run_pending(pending)
+                for (_, future, _), result in zip(pending, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self.running -= 1
+            self.batches.release()
+
+    async def run_pending(
+        self, batch: List[Tuple[str, asyncio.Future, Optional[float]]]
+    ) -> List[SliceResult]:
+        executor = self.executor
+        assert executor is not None
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor,
+                AsyncAnalysisService.analyse_batch,
+                [(source, deadline) for source, _, deadline in batch],
+            )
+        except BrokenProcessPool as e:
+            # the other batches sent to the broken pool fail too, and only
+            # the first one replaces it
+            if executor is self.executor:
+                self.restarts += 1
+                self.executor = self.make_executor()
+                executor.shutdown(wait=False)
+            return [(None, f"worker crashed: {e}", None)] * len(batch)
+        except Exception as e:
+            return [(None, f"{type(e).__name__}: {e}", None)] * len(batch)
+
+    async def submit(self, source: str) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Analyses a slice without counting it towards max_concurrency, and
+        returns its illegal flows and the reason its analysis stopped early,
+        if it did
+        """
+        assert self.queue is not None
+        start = time.perf_counter()
+        self.requests += 1
+
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.time() + self.timeout
+        future = asyncio.get_running_loop().create_future()
+        try:
+            # waits while the queue is full
+            await asyncio.wait_for(
+                self.queue.put((source, future, deadline)), self.timeout
+            )
+            remaining = None
+            if self.timeout is not None:
+                remaining = max(0.0, self.timeout - (time.perf_counter() - start))
+            illegal_flows, error, partial = await asyncio.wait_for(future, remaining)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            future.cancel()
+            raise
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+        if error is not None:
+            self.errors += 1
+            raise ValueError(error)
+        assert illegal_flows is not None
+        if partial is not None:
+            self.partial += 1
+
+        return illegal_flows, partial
+
+    async def analyse(self, source: str) -> List[Dict]:
+        """
+        Returns the illegal flows of a slice, in the output format
+        """
+        assert self.concurrency is not None
+        async with self.concurrency:
+            illegal_flows, _ = await self.submit(source)
+            return illegal_flows
+
+    async def analyse_many(
+        self, sources: List[str]
+    ) -> AsyncIterator[Tuple[int, Optional[List[Dict]], Optional[str]]]:
+        """
+        Yields the index and the illegal flows of each slice, or the error of
+        its analysis, as soon as each one is ready
+        """
+
+        async def analyse(i: int, source: str):
+            try:
+                return i, await self.analyse(source), None
+            except asyncio.TimeoutError:
+                return i, None, f"timed out after {self.timeout}s"
+            except ValueError as e:
+                return i, None, str(e)
+
+        tasks = [
+            asyncio.ensure_future(analyse(i, source))
+            for i, source in enumerate(sources)
+        ]
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+    def get_stats(self) -> Dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if len(latencies) == 0:
+                return None
+            return latencies[max(0, math.ceil(p / 100 * len(latencies)) - 1)]
+
+        return {
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "partial": self.partial,
+            "restarts": self.restarts,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "p50": percentile(50),
+            "p99": percentile(99),
+        }
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Answers the JSON-RPC requests of a client in the order they finish,
+        except notifications, which have no id and are not answered
+        """
+        assert self.concurrency is not None
+        concurrency = self.concurrency
+        lock = asyncio.Lock()
+
+        async def respond(response: Dict) -> None:
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        async def handle(request: Dict) -> None:
+            response = {"jsonrpc": "2.0", "id": request.get("id")}
+            try:
+                params = request.get("params", dict())
+                if request.get("method") == "stats":
+                    response["result"] = self.get_stats()
+                elif request.get("method") != "analyse":
+                    response["error"] = {
+                        "code": AnalysisServer.METHOD_NOT_FOUND,
+                        "message": f"Unknown method: {request.get('method')}",
+                    }
+                else:
+                    source = params.get("source")
+                    if source is None:
+                        if "path" not in params:
+                            raise ValueError("Either source or path is required")
+                        source = AnalysisServer.read_slice(
+                            self.slice_root, params["path"]
+                        )
+                    response["result"], partial = await self.submit(source)
+                    if partial is not None:
+                        response["partial"] = partial
+            except asyncio.TimeoutError:
+                response["error"] = {
+                    "code": AnalysisServer.ANALYSIS_ERROR,
+                    "message": f"timed out after {self.timeout}s",
+                }
+            except ValueError as e:
+                response["error"] = {
+                    "code": AnalysisServer.ANALYSIS_ERROR,
+                    "message": str(e),
+                }
+            except Exception as e:
+                response["error"] = {
+                    "code": AnalysisServer.ANALYSIS_ERROR,
+                    "message": f"{type(e).__name__}: {e}",
+                }
+            finally:
+                concurrency.release()
+            if "id" in request:
+                await respond(response)
+
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if line == b"":
+                    break
+                if line.strip() == b"":
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    await respond(
+                        AnalysisServer.error_response(
+                            None, AnalysisServer.PARSE_ERROR, str(e)
+                        )
+                    )
+                    continue
+                if not isinstance(request, dict):
+                    await respond(
+                        AnalysisServer.error_response(
+                            None, AnalysisServer.INVALID_REQUEST, "Invalid request"
+                        )
+                    )
+                    continue
+
+                # stops reading requests while too many are pending
+                await concurrency.acquire()
+                task = asyncio.create_task(handle(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def serve(self, address: str) -> None:
+        """
+        Serves clients on a Unix socket or host:port until cancelled
+        """
+        if ":" in address:
+            host, port = address.rsplit(":", 1)
+            server = await asyncio.start_server(self.handle_connection, host, int(port))
+        else:
+            AnalysisServer.remove_socket(address)
+            server = await asyncio.start_unix_server(self.handle_connection, address)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if ":" not in address:
+                AnalysisServer.remove_socket(address)
@@ -0,0 +1,183 @@
+import ast
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+from typing import List, Optional, TextIO
+
+from analysis.AnalysisStats import AnalysisStats
+from analysis.Analyser import Analyser
+from analysis.OutputWriter import OutputWriter
+from analysis.ResultCache import ResultCache
+
+
+class SliceResult:
+    """
+    Outcome of the analysis of one slice of a batch
+    """
+
+    def __init__(
+        self,
+        slice_path: str,
+        illegal_flows: int = 0,
+        elapsed: float = 0.0,
+        error: Optional[str] = None,
+        cached: bool = False,
+        partial: Optional[str] = None,
+    ) -> None:
+        self.slice_path = slice_path
+        self.illegal_flows = illegal_flows
+        self.elapsed = elapsed
+        self.error = error
+        self.cached = cached
+        self.partial = partial
+
+    def is_failed(self) -> bool:
+        return self.error is not None
+
+    def __repr__(self) -> str:
+        if self.is_failed():
+            return f"{self.slice_path}: FAILED ({self.error})"
+        if self.partial is not None:
+            return (
+                f"{self.slice_path}: {self.illegal_flows} illegal flows "
+                f"({self.elapsed:.3f}s, PARTIAL: {self.partial})"
+            )
+        return (
+            f"{self.slice_path}: {self.illegal_flows} illegal flows "
+            f"({self.elapsed:.3f}s{', cached' if self.cached else ''})"
+        )
+
+
+class BatchAnalyser:
+    """
+    Analyses many slices in a single process with the same analyser, so the
+    policy is loaded only once.
+
+    A slice that cannot be read, parsed or analysed is reported as failed
+    without stopping the analysis of the others. With a result cache, slices
+    whose illegal flows are cached are not analysed again. The stats of the
+    analysis of each slice can be written along with its illegal flows, with
+    the memory allocated in each stage if allocations are traced.
+    """
+
+    def __init__(
+        self,
+        analyser: Analyser,
+        output_writer: OutputWriter,
+        summary: Optional[TextIO] = sys.stdout,
+        result_cache: Optional[ResultCache] = None,
+        write_stats: bool = False,
+        trace_allocations: bool = False,
+    ) -> None:
+        self.analyser = analyser
+        self.output_writer = output_writer
+        self.summary = summary
+        self.result_cache = result_cache
+        self.write_stats = write_stats
+        self.trace_allocations = trace_allocations
+
+    @staticmethod
+    def find_slices(inputs: List[str]) -> List[str]:
+        """
+        Expands directories, glob patterns and manifest files (one slice path
+        per line, relative to the manifest) into the list of slice paths.
+        """
+        slice_paths = []
+        for path in inputs:
+            if os.path.isdir(path):
+                slice_paths += sorted(
+                    glob.glob(os.path.join(path, "**", "*.py"), recursive=True)
+                )
+            elif path.endswith(".py"):
+                slice_paths += sorted(glob.glob(path, recursive=True)) or [path]
+            elif os.path.isfile(path):
+                manifest_dir = os.path.dirname(path)
+                with open(path, "r") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line and not line.startswith("#"):
+                            slice_paths.append(os.path.join(manifest_dir, line))
+            else:
+                slice_paths += sorted(glob.glob(path, recursive=True))
+
+        return slice_paths
+
+    def analyse_slice(self, slice_path: str) -> SliceResult:
+        start = time.perf_counter()
+        stats = AnalysisStats()
+        if self.trace_allocations:
+            tracemalloc.start()
+        try:
+            with open(slice_path, "r") as f:
+                source = f.read()
+            with stats.measure("parse"):
+                tree = ast.parse(source)
+            if self.result_cache is not None:
+                illegal_flows, cached = self.result_cache.analyse(
+                    self.analyser, tree, stats
+                )
+            else:
+                illegal_flows, cached = self.analyser.analyse(tree, stats), False
+            elapsed = time.perf_counter() - start
+
+            self.output_writer.write(slice_path, illegal_flows)
+            self.output_writer.write_partial(slice_path, stats)
+            if self.write_stats:
+                self.output_writer.write_stats(
+                    slice_path,
+                    stats,
+                    mode=self.analyser.mode,
+                    elapsed=elapsed,
+                    cached=cached,
+                )
+        except Exception as e:
+            return SliceResult(slice_path, error=f"{type(e).__name__}: {e}")
+        finally:
+            if self.trace_allocations:
+                tracemalloc.stop()
+
+        return SliceResult(
+            slice_path,
+            len(illegal_flows),
+            elapsed,
+            cached=cached,
+            partial=stats.partial,
+        )
+
+    def run(self, slice_paths: List[str]) -> List[SliceResult]:
+        self.output_writer.set_batch(slice_paths)
+        results = []
+        for slice_path in slice_paths:
+            result = self.analyse_slice(slice_path)
+            results.append(result)
+            self.report(result)
+
+        self.report_totals(results)
+        return results
+
+    def report(self, result: SliceResult) -> None:
+        if self.summary is not None:
+            print(result, file=self.summary, flush=True)
+
+    def report_totals(self, results: List[SliceResult]) -> None:
+        if self.summary is None:
+            return
+
+        failed = sum(1 for result in results if result.is_failed())
+        partial = sum(1 for result in results if result.partial is not None)
+        illegal_flows = sum(result.illegal_flows for result in results)
+        print(
+            f"\nAnalysed {len(results) - failed}/{len(results)} slices, "
+            f"{illegal_flows} illegal flows, {failed} failed, {partial} partial",
+            file=self.summary,
+        )
+
+        if self.result_cache is not None:
+            hits = sum(1 for result in results if result.cached)
+            print(
+                f"Result cache: {hits} hits, {len(results) - failed - hits} misses",
+                file=self.summary,
+            )
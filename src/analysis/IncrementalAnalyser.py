@@ -0,0 +1,160 @@
+import ast
+import pickle
+
+from typing import Dict, List, Optional, Set
+
+from domain.FlowAggregator import FlowAggregator
+from domain.IllegalFlow import IllegalFlow
+from domain.LabelEncoding import LabelEncoding
+from domain.MultiLabel import MultiLabel
+from domain.MultiLabelling import MultiLabelling
+from domain.Policy import Policy
+from domain.Variable import Variable
+from domain.Vulnerabilities import Vulnerabilities
+
+from visitors.FixpointProcessor import FixpointProcessor, State
+from visitors.UninitializedVariableDetector import UninitializedVariableDetector
+
+from analysis.AnalysisBudget import AnalysisBudget
+from analysis.Analyser import Analyser
+from analysis.ResultCache import ResultCache
+from analysis.StateUnpickler import StateUnpickler
+
+
+class IncrementalAnalyser(Analyser):
+    """
+    Analyses successive versions of a slice in the "fixpoint" mode, starting
+    from the first top-level statement that changed since the last version.
+
+    The state of the analysis is kept after each top-level statement, along
+    with the illegal flows found in it. Statements are compared through
+    their dumps, which include line numbers, as the illegal flows do. An
+    analysis stopped by its budget keeps the states of the statements it
+    analysed, and the next one starts from the first statement it did not.
+    """
+
+    def __init__(self, policy: Policy, budget: Optional[AnalysisBudget] = None) -> None:
+        super().__init__(policy, "fixpoint", budget)
+        self.key = IncrementalAnalyser.get_key(policy)
+
+        # encoding of the multi-labels of the states, kept with them
+        self.label_encoding = LabelEncoding()
+        self.stmt_dumps: List[str] = []
+        # states before each statement and after the last one
+        self.states: List[State] = [
+            (MultiLabelling(), UninitializedVariableDetector())
+        ]
+        # illegal flows found in each statement
+        self.illegal_flows: List[Set[IllegalFlow]] = []
+
+    @staticmethod
+    def get_key(policy: Policy) -> str:
+        return ResultCache.hash_parts(
+            Analyser.get_version(), ResultCache.dump_patterns(policy.get_patterns())
+        )
+
+    def analyse_fixpoint(self, tree: ast.Module) -> FlowAggregator:
+        self.stats.count("total_statements", len(tree.body))
+        stmt_dumps = [ResultCache.dump_tree(stmt) for stmt in tree.body]
+
+        start = 0
+        while (
+            start < min(len(stmt_dumps), len(self.illegal_flows))
+            and stmt_dumps[start] == self.stmt_dumps[start]
+        ):
+            start += 1
+
+        del self.states[start + 1 :]
+        del self.illegal_flows[start:]
+
+        self.stats.count("reused_statements", start)
+
+        fixpoint_processor = FixpointProcessor(
+            Vulnerabilities(self.policy, label_encoding=self.label_encoding)
+        )
+        flow_aggregator = FlowAggregator(self.on_final)
+        for index, stmt in enumerate(tree.body):
+            if index >= start:
+                if self.budget is not None:
+                    # the budget of paths does not apply to a single pass
+                    reason = self.budget.check(index - start, None)
+                    if reason is not None:
+                        self.stats.stop(reason)
+                        break
+
+                with self.stats.measure("labelling"):
+                    vulnerabilities = Vulnerabilities(
+                        self.policy, label_encoding=self.label_encoding
+                    )
+                    fixpoint_processor.vulnerabilities = vulnerabilities
+                    fixpoint_processor.set_state(
+                        fixpoint_processor.fork_state(self.states[-1])
+                    )
+                    fixpoint_processor.visit_stmts([stmt])
+
+                self.states.append(fixpoint_processor.get_state())
+                self.illegal_flows.append(vulnerabilities.get_illegal_flows())
+            self.stats.count("statements")
+
+            # the illegal flows of a statement are final once the statements
+            # that follow it start
+            with self.stats.measure("merge"):
+                flow_aggregator.update(self.illegal_flows[index])
+                if index + 1 < len(tree.body):
+                    flow_aggregator.finalize(tree.body[index + 1].lineno)
+
+        # only the statements with a state are reused by the next analysis
+        self.stmt_dumps = stmt_dumps[: len(self.illegal_flows)]
+        return flow_aggregator
+
+    def prune(self) -> None:
+        """
+        Replaces the encoding of the multi-labels of the states by one with
+        only the sources and flows that the states still hold, as the ones of
+        the statements analysed before a change are never decoded again.
+        """
+        label_encoding = LabelEncoding()
+
+        def reencode(multi_label: MultiLabel) -> MultiLabel:
+            return self.label_encoding.reencode(multi_label, label_encoding)
+
+        mapped_scopes: Dict[int, Dict[Variable, MultiLabel]] = dict()
+        self.states = [
+            (multilabelling.map_multi_labels(reencode, mapped_scopes), detector)
+            for multilabelling, detector in self.states
+        ]
+        self.label_encoding = label_encoding
+
+    @staticmethod
+    def load(
+        state_path: str, policy: Policy, budget: Optional[AnalysisBudget] = None
+    ) -> "IncrementalAnalyser":
+        """
+        Loads the analyser saved in a state file, or creates a new one if
+        there is none or it was saved with a different policy or version of the
+        analyser. State files are read with a StateUnpickler, so one that holds
+        anything but a state is discarded.
+
+        The loaded analyser keeps the policy it was saved with, as the
+        patterns of the encoding of its multi-labels are that policy's, and
+        gets the given budget.
+        """
+        analyser: Optional[IncrementalAnalyser] = None
+        try:
+            with open(state_path, "rb") as f:
+                analyser = StateUnpickler(f).load()
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+
+        if not isinstance(
+            analyser, IncrementalAnalyser
+        ) or analyser.key != IncrementalAnalyser.get_key(policy):
+            analyser = IncrementalAnalyser(policy)
+
+        analyser.budget = budget
+        return analyser
+
+    def save(self, state_path: str) -> None:
+        self.prune()
+        with open(state_path, "wb") as f:
+            pickle.dump(self, f)
@@ -0,0 +1,32 @@
+import json
+
+from typing import Iterable, Set, TextIO, Tuple
+
+from domain.IllegalFlow import IllegalFlow
+
+
+class JsonLinesWriter:
+    """
+    Writes illegal flows as JSON Lines, one compact JSON object per line.
+
+    Each batch of illegal flows is flushed once written, so that the readers
+    of a pipe get them as soon as they are final. Illegal flows that were
+    already written are skipped, so all the illegal flows of a slice can be
+    written at the end of an analysis that streamed some of them.
+    """
+
+    def __init__(self, file: TextIO) -> None:
+        self.file = file
+        # keys of the illegal flows written
+        self.written: Set[Tuple] = set()
+
+    def write(self, illegal_flows: Iterable[IllegalFlow]) -> None:
+        for illegal_flow in illegal_flows:
+            key = illegal_flow.get_key()
+            if key in self.written:
+                continue
+            self.written.add(key)
+            self.file.write(
+                json.dumps(illegal_flow.to_json(), separators=(",", ":")) + "\n"
+            )
+        self.file.flush()
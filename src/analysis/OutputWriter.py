@@ -0,0 +1,177 @@
+from contextlib import contextmanager
+import json
+import os
+import sys
+
+from typing import Dict, Iterator, List, Optional, TextIO
+
+from domain.IllegalFlow import IllegalFlow
+
+from analysis.AnalysisStats import AnalysisStats
+from analysis.JsonLinesWriter import JsonLinesWriter
+
+
+class OutputWriter:
+    """
+    Writes the illegal flows of a slice to <output_dir>/<slice>.output.json,
+    and the stats of its analysis to <output_dir>/<slice>.stats.json
+
+    The illegal flows of an analysis stopped by its budget are marked as
+    partial by <output_dir>/<slice>.partial.json, which holds the reason and
+    the coverage of the analysis.
+
+    In the "jsonl" format the illegal flows are written as JSON Lines to
+    <output_dir>/<slice>.output.jsonl instead. The illegal flows of a single
+    slice can also be written to another file, where "-" is the standard
+    output.
+
+    The files in <output_dir> are written to a temporary file that replaces
+    them once complete, so an analysis killed while writing never leaves a
+    truncated output. Other files are written in place, so that a pipe gets
+    the illegal flows as they are streamed.
+
+    The <slice> of the slices of a batch is their path relative to the
+    deepest directory that holds all of them, without the extension, so
+    slices with the same file name in different directories have different
+    outputs.
+    """
+
+    FORMATS = ("json", "jsonl")
+
+    def __init__(self, output_dir: str = "output", output_format: str = "json") -> None:
+        if output_format not in OutputWriter.FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.output_dir = output_dir
+        self.output_format = output_format
+        # names of the slices of a batch, by slice path
+        self.slice_names: Dict[str, str] = dict()
+
+    def set_batch(self, slice_paths: List[str]) -> None:
+        """
+        Names the slices of a batch after their paths relative to the
+        deepest directory that holds all of them.
+
+        Raises ValueError if two slices would have the same outputs.
+        """
+        if len(slice_paths) == 0:
+            return
+        root = os.path.commonpath(
+            [os.path.dirname(os.path.abspath(path)) for path in slice_paths]
+        )
+
+        slice_names: Dict[str, str] = dict()
+        named: Dict[str, str] = dict()
+        for slice_path in slice_paths:
+            relative_path = os.path.relpath(os.path.abspath(slice_path), root)
+            slice_name = os.path.splitext(relative_path)[0]
+            other_path = named.setdefault(slice_name, slice_path)
+            if os.path.abspath(other_path) != os.path.abspath(slice_path):
+                raise ValueError(
+                    f"Slices {other_path} and {slice_path} have the same output "
+                    f"name: {slice_name}"
+                )
+            slice_names[slice_path] = slice_name
+        self.slice_names = slice_names
+
+    def get_slice_name(self, slice_path: str) -> str:
+        if slice_path in self.slice_names:
+            return self.slice_names[slice_path]
+        return os.path.splitext(os.path.basename(slice_path))[0]
+
+    def get_output_path(
+        self, slice_path: str, kind: str = "output", extension: str = "json"
+    ) -> str:
+        slice_name = self.get_slice_name(slice_path)
+        return os.path.join(self.output_dir, f"{slice_name}.{kind}.{extension}")
+
+    @staticmethod
+    def make_dirs(output_path: str) -> None:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    @staticmethod
+    @contextmanager
+    def open_atomic(output_path: str) -> Iterator[TextIO]:
+        """
+        Opens a temporary file that replaces output_path once it is written
+        """
+        OutputWriter.make_dirs(output_path)
+        temp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                yield f
+            os.replace(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @contextmanager
+    def open_output(
+        self, slice_path: str, output_path: Optional[str] = None
+    ) -> Iterator[TextIO]:
+        if output_path == "-":
+            yield sys.stdout
+            return
+
+        if output_path is None:
+            output_path = self.get_output_path(
+                slice_path, extension=self.output_format
+            )
+            with OutputWriter.open_atomic(output_path) as f:
+                yield f
+            return
+
+        with open(output_path, "w") as f:
+            yield f
+
+    def write(
+        self,
+        slice_path: str,
+        illegal_flows: List[IllegalFlow],
+        output_path: Optional[str] = None,
+    ) -> None:
+        if self.output_format == "jsonl":
+            with self.stream(slice_path, output_path) as json_lines_writer:
+                json_lines_writer.write(illegal_flows)
+            return
+
+        output = [illegal_flow.to_json() for illegal_flow in illegal_flows]
+        with self.open_output(slice_path, output_path) as f:
+            f.write(json.dumps(output, indent=4) + "\n")
+
+    @contextmanager
+    def stream(
+        self, slice_path: str, output_path: Optional[str] = None
+    ) -> Iterator[JsonLinesWriter]:
+        """
+        Opens the JSON Lines output of a slice, to write its illegal flows as
+        they are found and then all of them, which skips the ones written
+        """
+        with self.open_output(slice_path, output_path) as f:
+            yield JsonLinesWriter(f)
+
+    def write_stats(self, slice_path: str, stats: AnalysisStats, **fields) -> None:
+        output = {"slice": slice_path, **fields, **stats.to_json()}
+        with OutputWriter.open_atomic(self.get_output_path(slice_path, "stats")) as f:
+            f.write(json.dumps(output, indent=4) + "\n")
+
+    def write_partial(self, slice_path: str, stats: AnalysisStats) -> None:
+        """
+        Marks the output of a slice as partial, or removes the mark left by a
+        previous analysis if it is complete
+        """
+        partial_path = self.get_output_path(slice_path, "partial")
+        if not stats.is_partial():
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return
+
+        output = {
+            "slice": slice_path,
+            "reason": stats.partial,
+            "coverage": stats.get_coverage(),
+        }
+        for counter in ("paths", "total_paths", "statements", "total_statements"):
+            if counter in stats.counters:
+                output[counter] = stats.counters[counter]
+        with OutputWriter.open_atomic(partial_path) as f:
+            f.write(json.dumps(output, indent=4) + "\n")
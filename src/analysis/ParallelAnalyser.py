@@ -0,0 +1,136 @@
+import ast
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+
+from typing import List, Optional, Tuple
+
+from domain.FlowAggregator import FlowAggregator
+from domain.MultiLabel import MultiLabel
+from domain.Policy import Policy
+
+from analysis.AnalysisBudget import AnalysisBudget
+from analysis.AnalysisStats import AnalysisStats
+from analysis.Analyser import Analyser
+
+
+class ParallelAnalyser(Analyser):
+    """
+    Analyses the combinations of branches of a slice in worker processes.
+
+    The branch space is split by prefix of the branch vector, and each
+    worker analyses every path that starts with the prefixes it is given.
+    The illegal flows of the workers are merged in prefix order, so the
+    result is the same as the one of a sequential run.
+    """
+
+    # prefixes per worker, so that workers that finish early get more work
+    CHUNKS_PER_JOB = 4
+
+    # analyser, tree of the slice and choices of branches, set in each worker
+    # process
+    worker: Optional[Tuple[Analyser, ast.Module, List[List[Tuple[bool, int]]]]] = None
+
+    def __init__(
+        self,
+        policy: Policy,
+        mode: str = "paths",
+        jobs: Optional[int] = None,
+        budget: Optional[AnalysisBudget] = None,
+    ) -> None:
+        super().__init__(policy, mode, budget)
+        self.jobs = jobs or os.cpu_count() or 1
+
+    def analyse_branches(
+        self, tree: ast.Module, branch_choices: List[List[Tuple[bool, int]]]
+    ) -> FlowAggregator:
+        paths = Analyser.count_paths(branch_choices)
+        if self.jobs <= 1 or paths == 1:
+            return super().analyse_branches(tree, branch_choices)
+
+        chunks = self.jobs * ParallelAnalyser.CHUNKS_PER_JOB
+        prefix_length = 0
+        while (
+            prefix_length < len(branch_choices)
+            and Analyser.count_paths(branch_choices[:prefix_length]) < chunks
+        ):
+            prefix_length += 1
+        prefixes = list(itertools.product(*branch_choices[:prefix_length]))
+        self.stats.count("total_paths", paths)
+
+        shares = ParallelAnalyser.split_budget(self.budget, len(prefixes))
+        if 0 in shares:
+            # the prefixes without a share of the budget of paths are not
+            # analysed
+            assert self.budget is not None
+            self.stats.stop(f"path budget of {self.budget.max_paths} paths exhausted")
+        budgeted = [
+            (prefix, max_paths)
+            for prefix, max_paths in zip(prefixes, shares)
+            if max_paths != 0
+        ]
+
+        flow_aggregator = FlowAggregator()
+        with ProcessPoolExecutor(
+            self.jobs,
+            initializer=ParallelAnalyser.init_worker,
+            initargs=(self.policy, tree, branch_choices, self.budget),
+        ) as executor:
+            for prefix_flow_aggregator, prefix_stats in executor.map(
+                ParallelAnalyser.analyse_prefix,
+                [prefix for prefix, _ in budgeted],
+                [max_paths for _, max_paths in budgeted],
+            ):
+                with self.stats.measure("merge"):
+                    flow_aggregator.merge(prefix_flow_aggregator)
+                self.stats.merge(prefix_stats)
+
+        return flow_aggregator
+
+    @staticmethod
+    def split_budget(
+        budget: Optional[AnalysisBudget], prefixes: int
+    ) -> List[Optional[int]]:
+        """
+        Returns the share of the budget of paths of each prefix, which add up
+        to the budget. The first prefixes get the remainder of the division,
+        and prefixes get no paths when there are more of them than paths.
+        """
+        if budget is None or budget.max_paths is None:
+            return [None] * prefixes
+        share, remainder = divmod(budget.max_paths, prefixes)
+        shares: List[Optional[int]] = [share + 1] * remainder
+        return shares + [share] * (prefixes - remainder)
+
+    @staticmethod
+    def init_worker(
+        policy: Policy,
+        tree: ast.Module,
+        branch_choices: List[List[Tuple[bool, int]]],
+        budget: Optional[AnalysisBudget],
+    ) -> None:
+        ParallelAnalyser.worker = (
+            Analyser(policy, "paths", budget),
+            tree,
+            branch_choices,
+        )
+
+    @staticmethod
+    def analyse_prefix(
+        prefix: Tuple[Tuple[bool, int], ...], max_paths: Optional[int]
+    ) -> Tuple[FlowAggregator, AnalysisStats]:
+        assert ParallelAnalyser.worker is not None
+        analyser, tree, branch_choices = ParallelAnalyser.worker
+        analyser.stats = AnalysisStats()
+        combines = MultiLabel.calls["combine"]
+
+        flow_aggregator = FlowAggregator()
+        branches = Analyser.get_branches(branch_choices, prefix)
+        for illegal_flows in analyser.iter_paths(tree, branches, max_paths):
+            with analyser.stats.measure("merge"):
+                flow_aggregator.update(illegal_flows)
+
+        analyser.stats.count(
+            "multi_label_combines", MultiLabel.calls["combine"] - combines
+        )
+        return flow_aggregator, analyser.stats
@@ -0,0 +1,200 @@
+from collections import deque
+import multiprocessing
+from multiprocessing.connection import Connection, wait
+import os
+import re
+import sys
+import time
+
+from typing import Deque, Dict, List, Optional, TextIO
+
+from analysis.Analyser import Analyser
+from analysis.BatchAnalyser import BatchAnalyser, SliceResult
+from analysis.OutputWriter import OutputWriter
+from analysis.ResultCache import ResultCache
+
+
+class Worker:
+    """
+    Process that analyses the slices it receives one at a time
+    """
+
+    def __init__(self, batch_analyser: BatchAnalyser) -> None:
+        self.connection, worker_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=Worker.work, args=(batch_analyser, worker_connection), daemon=True
+        )
+        self.process.start()
+        worker_connection.close()
+
+        self.slice_path: Optional[str] = None
+        self.start = 0.0
+
+    @staticmethod
+    def work(batch_analyser: BatchAnalyser, connection: Connection) -> None:
+        while True:
+            slice_path = connection.recv()
+            if slice_path is None:
+                break
+            connection.send(batch_analyser.analyse_slice(slice_path))
+
+    def is_busy(self) -> bool:
+        return self.slice_path is not None
+
+    def send(self, slice_path: str) -> None:
+        self.slice_path = slice_path
+        self.start = time.perf_counter()
+        self.connection.send(slice_path)
+
+    def receive(self) -> SliceResult:
+        try:
+            result = self.connection.recv()
+        except (EOFError, OSError):
+            self.process.join()
+            return self.fail(f"worker exited with code {self.process.exitcode}")
+        self.slice_path = None
+        return result
+
+    def fail(self, error: str) -> SliceResult:
+        """
+        Returns the result of the slice being analysed as failed
+        """
+        assert self.slice_path is not None
+        result = SliceResult(self.slice_path, elapsed=self.get_elapsed(), error=error)
+        self.slice_path = None
+        return result
+
+    def get_elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+
+
+class ParallelBatchAnalyser(BatchAnalyser):
+    """
+    Analyses the slices of a batch in a pool of worker processes.
+
+    The slices wait in a single queue, largest first according to an
+    estimate of their cost, and each worker is sent the next slice as soon
+    as it finishes the previous one. So one huge slice only holds up its own
+    worker, while the others go on with the rest of the queue, and the batch
+    does not end with the largest slices started last. A slice that exceeds
+    the timeout or crashes its worker is reported as failed, and the worker
+    is replaced.
+    """
+
+    # time between checks for slices that exceeded the timeout
+    POLL_INTERVAL = 0.1
+
+    # lines that start an if, elif or while statement
+    CONTROL_FLOW_LINE = re.compile(rb"^[ \t]*(?:if|elif|while)\b", re.MULTILINE)
+
+    def __init__(
+        self,
+        analyser: Analyser,
+        output_writer: OutputWriter,
+        summary: Optional[TextIO] = sys.stdout,
+        result_cache: Optional[ResultCache] = None,
+        write_stats: bool = False,
+        trace_allocations: bool = False,
+        jobs: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        super().__init__(
+            analyser,
+            output_writer,
+            summary,
+            result_cache,
+            write_stats,
+            trace_allocations,
+        )
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout
+
+    def estimate_cost(self, slice_path: str) -> int:
+        """
+        Estimates the cost of a slice as the size of its file times the
+        number of paths the analyser explores. The control flow statements
+        are counted by the lines they start on, which takes no parsing, so
+        the workers start on the largest slices at once.
+        """
+        try:
+            with open(slice_path, "rb") as f:
+                source = f.read()
+        except OSError:
+            return 0
+
+        if self.analyser.mode != "paths":
+            return len(source)
+
+        count = len(ParallelBatchAnalyser.CONTROL_FLOW_LINE.findall(source))
+        return len(source) * len(Analyser.BRANCH_CHOICES) ** count
+
+    def schedule(self, slice_paths: List[str]) -> Deque[str]:
+        """
+        Returns the queue of the slices, largest first
+        """
+        return deque(sorted(slice_paths, key=self.estimate_cost, reverse=True))
+
+    def run(self, slice_paths: List[str]) -> List[SliceResult]:
+        self.output_writer.set_batch(slice_paths)
+        queue = self.schedule(slice_paths)
+        worker_batch_analyser = BatchAnalyser(
+            self.analyser,
+            self.output_writer,
+            None,
+            self.result_cache,
+            self.write_stats,
+            self.trace_allocations,
+        )
+        workers = [Worker(worker_batch_analyser) for _ in range(self.jobs)]
+
+        results: Dict[str, SliceResult] = dict()
+        try:
+            while True:
+                for worker in workers:
+                    if not worker.is_busy() and len(queue) > 0:
+                        worker.send(queue.popleft())
+
+                busy = [worker for worker in workers if worker.is_busy()]
+                if len(busy) == 0:
+                    break
+
+                ready = wait(
+                    [worker.connection for worker in busy],
+                    timeout=ParallelBatchAnalyser.POLL_INTERVAL,
+                )
+                for i, worker in enumerate(workers):
+                    if worker.connection in ready:
+                        result = worker.receive()
+                        if not worker.process.is_alive():
+                            workers[i] = Worker(worker_batch_analyser)
+                    elif (
+                        worker.is_busy()
+                        and self.timeout is not None
+                        and worker.get_elapsed() > self.timeout
+                    ):
+                        worker.kill()
+                        result = worker.fail(f"timed out after {self.timeout}s")
+                        workers[i] = Worker(worker_batch_analyser)
+                    else:
+                        continue
+
+                    results[result.slice_path] = result
+                    self.report(result)
+        finally:
+            for worker in workers:
+                worker.stop()
+
+        ordered_results = [results[slice_path] for slice_path in slice_paths]
+        self.report_totals(ordered_results)
+        return ordered_results
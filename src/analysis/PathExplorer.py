@@ -0,0 +1,336 @@
+import ast
+
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+from domain.FlowAggregator import FlowAggregator, OnFinal
+from domain.Policy import Policy
+from domain.Vulnerabilities import Vulnerabilities
+
+from visitors.ControlFlowNodeCounter import ControlFlowNodeCounter
+from visitors.NodeProcessor import NodeProcessor
+from visitors.UninitializedVariableDetector import UninitializedVariableDetector
+
+from analysis.AnalysisBudget import AnalysisBudget
+from analysis.AnalysisStats import AnalysisStats
+
+# state of the analysis along a path, and the number of paths it stands for
+State = Tuple[Vulnerabilities, UninitializedVariableDetector]
+Paths = List[Tuple[State, int]]
+Key = Tuple[FrozenSet, FrozenSet]
+
+
+class PathExplorer:
+    """
+    Explores the paths of a slice depth-first, analysing the statements that
+    several paths share once for all of them.
+
+    The state of the analysis is carried from statement to statement and
+    forked at each if and while statement, once per branch. States that are
+    equal after a control flow statement are merged, so the rest of the
+    slice is analysed once for all the paths that reach it in that state.
+
+    The paths are the ones of the "paths" mode, where the body of a while
+    statement is repeated with the same branches of its if statements, as
+    long as the slice is explorable. Irrelevant control flow statements
+    only take their else branch, which stands for all of their paths.
+
+    The illegal flows whose sinks are before every state still to be
+    followed are final, and are passed to on_final.
+    """
+
+    def __init__(
+        self,
+        policy: Policy,
+        branch_choices: Sequence[Tuple[bool, int]],
+        stats: AnalysisStats,
+        budget: Optional[AnalysisBudget] = None,
+        irrelevant_blocks: Optional[Set[ast.stmt]] = None,
+        on_final: Optional[OnFinal] = None,
+    ) -> None:
+        if irrelevant_blocks is None:
+            irrelevant_blocks = set()
+        self.policy = policy
+        self.stats = stats
+        self.budget = budget
+        self.irrelevant_blocks = irrelevant_blocks
+
+        self.choices = len(branch_choices)
+        self.else_choices = sum(1 for branch, _ in branch_choices if not branch)
+        # choices of the body of a while statement by number of repetitions
+        self.repeat_choices: Dict[int, int] = dict()
+        for branch, repeat in branch_choices:
+            if branch:
+                self.repeat_choices[repeat] = self.repeat_choices.get(repeat, 0) + 1
+        self.body_choices = sum(self.repeat_choices.values())
+
+        self.on_final = on_final
+        self.flow_aggregator = FlowAggregator(on_final)
+        self.states = 0
+
+    @staticmethod
+    def can_explore(tree: ast.Module) -> bool:
+        """
+        Whether the paths of a slice can be explored instead of enumerated.
+
+        The if and while statements must be where the "paths" mode expects
+        them: while statements at the top level, if statements at the top
+        level or in the body of another control flow statement. Each
+        statement must start after the previous ones end, so that the
+        variables initialized before a statement are the ones initialized by
+        the statements before it on the path.
+        """
+        stmts: List[ast.stmt] = []
+
+        def collect(body: List[ast.stmt], top_level: bool) -> bool:
+            for stmt in body:
+                if isinstance(stmt, (ast.If, ast.While)):
+                    if isinstance(stmt, ast.While) and not top_level:
+                        return False
+                    if not collect(stmt.body, False) or not collect(
+                        stmt.orelse, False
+                    ):
+                        return False
+                    if PathExplorer.count_control_flow_nodes(stmt.orelse) > 0:
+                        return False
+                elif any(
+                    isinstance(node, (ast.If, ast.While)) for node in ast.walk(stmt)
+                ):
+                    return False
+                else:
+                    stmts.append(stmt)
+            return True
+
+        if not collect(tree.body, True):
+            return False
+
+        end_lineno = 0
+        for stmt in stmts:
+            if stmt.lineno <= end_lineno:
+                return False
+            end_lineno = max(end_lineno, stmt.end_lineno or stmt.lineno)
+        return True
+
+    @staticmethod
+    def count_control_flow_nodes(stmts: List[ast.stmt]) -> int:
+        control_flow_node_counter = ControlFlowNodeCounter()
+        for stmt in stmts:
+            control_flow_node_counter.visit(stmt)
+
+        return control_flow_node_counter.get_count()
+
+    def explore(self, tree: ast.Module) -> FlowAggregator:
+        """
+        Returns the illegal flows of every path of an explorable slice
+        """
+        body = tree.body
+        # number of paths through the statements from each one on
+        suffix_paths = [1] * (len(body) + 1)
+        for index in reversed(range(len(body))):
+            suffix_paths[index] = suffix_paths[index + 1] * self.choices ** (
+                PathExplorer.count_control_flow_nodes([body[index]])
+            )
+
+        # states reached after each top-level statement
+        visited = set()
+        stack = [(0, self.new_state(), 1)]
+        while len(stack) > 0 and not self.stats.is_partial():
+            index, state, paths = stack.pop()
+            end = index
+            while end < len(body) and not isinstance(body[end], (ast.If, ast.While)):
+                end += 1
+            self.run(body[index:end], state)
+
+            if end == len(body):
+                self.retire(state)
+                self.stats.count("paths", paths)
+                continue
+
+            outcomes = self.merge(self.explore_node(body[end], [(state, paths)]))
+            continuations = []
+            for key, (state, paths) in outcomes.items():
+                if (end + 1, key) in visited:
+                    # the rest of the slice was analysed from this state
+                    self.retire(state)
+                    self.stats.count("merged_states")
+                    self.stats.count("paths", paths * suffix_paths[end + 1])
+                    continue
+                visited.add((end + 1, key))
+                continuations.append((end + 1, state, paths))
+            stack += reversed(continuations)
+
+            # the states on the stack were forked at the statement before the
+            # one they continue from, so the flows they have not collected
+            # reach sinks from that statement on
+            if self.on_final is not None and len(stack) > 0:
+                with self.stats.measure("merge"):
+                    self.flow_aggregator.finalize(
+                        min(body[start - 1].lineno for start, _, _ in stack)
+                    )
+
+        return self.flow_aggregator
+
+    def explore_node(self, node: ast.stmt, states: Paths) -> Paths:
+        """
+        Returns the states after each branch of a control flow statement
+        """
+        assert isinstance(node, (ast.If, ast.While))
+        # paths of the control flow statements in the body, which are not
+        # followed when the else branch is taken
+        body_paths = self.choices ** PathExplorer.count_control_flow_nodes(node.body)
+        else_paths = body_paths * self.else_choices
+        if node in self.irrelevant_blocks:
+            else_paths = body_paths * self.choices
+
+        outcomes: Paths = []
+        for state, paths in states:
+            if self.stats.is_partial():
+                break
+            self.retire(state)
+            outcomes += self.explore_branch(
+                node.orelse, [(self.fork(state), paths * else_paths)]
+            )
+            if node in self.irrelevant_blocks:
+                continue
+
+            if isinstance(node, ast.If):
+                outcomes += self.explore_branch(
+                    node.body, [(self.fork(state), paths * self.body_choices)]
+                )
+                continue
+
+            # the branches of the body are the same in every repetition
+            for stmts, stmts_paths in self.flatten(node.body):
+                repeated = state
+                repeats = 0
+                for repeat in sorted(self.repeat_choices):
+                    repeated = self.fork(repeated)
+                    for _ in range(repeat - repeats):
+                        self.run(stmts, repeated)
+                    repeats = repeat
+                    outcomes.append(
+                        (
+                            repeated,
+                            paths * stmts_paths * self.repeat_choices[repeat],
+                        )
+                    )
+
+        return outcomes
+
+    def explore_branch(self, stmts: List[ast.stmt], states: Paths) -> Paths:
+        """
+        Returns the states after the paths of a branch, merging the equal
+        ones after each if statement
+        """
+        index = 0
+        while index < len(stmts):
+            end = index
+            while end < len(stmts) and not isinstance(stmts[end], ast.If):
+                end += 1
+            for state, _ in states:
+                self.run(stmts[index:end], state)
+
+            if end < len(stmts):
+                outcomes = self.explore_node(stmts[end], states)
+                states = list(self.merge(outcomes).values())
+            index = end + 1
+
+        return states
+
+    def flatten(self, stmts: List[ast.stmt]) -> List[Tuple[List[ast.stmt], int]]:
+        """
+        Returns the sequences of statements of each combination of branches
+        of the if statements of a branch, and their numbers of paths
+        """
+        flattened: List[Tuple[List[ast.stmt], int]] = [([], 1)]
+        for stmt in stmts:
+            if not isinstance(stmt, ast.If):
+                flattened = [(path + [stmt], paths) for path, paths in flattened]
+                continue
+
+            body_paths = self.choices ** PathExplorer.count_control_flow_nodes(
+                stmt.body
+            )
+            if stmt in self.irrelevant_blocks:
+                branches = [(stmt.orelse, body_paths * self.choices)]
+            else:
+                branches = [(stmt.orelse, body_paths * self.else_choices)] + [
+                    (path, paths * self.body_choices)
+                    for path, paths in self.flatten(stmt.body)
+                ]
+            flattened = [
+                (path + branch, paths * branch_paths)
+                for path, paths in flattened
+                for branch, branch_paths in branches
+            ]
+
+        return flattened
+
+    def new_state(self) -> State:
+        return Vulnerabilities(self.policy), UninitializedVariableDetector()
+
+    def fork(self, state: State) -> State:
+        """
+        Returns a copy of a state, stopping the exploration when the budget
+        is exhausted
+        """
+        self.states += 1
+        self.stats.count("states")
+        if self.budget is not None:
+            # the budget of paths limits the states explored
+            reason = self.budget.check(self.states, self.budget.max_paths)
+            if reason is not None:
+                self.stats.stop(reason)
+
+        vulnerabilities, uninitialized_variable_detector = state
+        return vulnerabilities.fork(), uninitialized_variable_detector.copy()
+
+    def run(self, stmts: List[ast.stmt], state: State) -> None:
+        if len(stmts) == 0:
+            return
+
+        vulnerabilities, uninitialized_variable_detector = state
+        # the statements start after the previous ones end, so their
+        # variables can be found before they are labelled
+        with self.stats.measure("uninitialized"):
+            uninitialized_variable_detector.visit_stmts(stmts)
+
+        with self.stats.measure("labelling"):
+            node_processor = NodeProcessor(
+                vulnerabilities, uninitialized_variable_detector
+            )
+            node_processor.visit_stmts(stmts)
+
+    def merge(self, states: Paths) -> Dict[Key, Tuple[State, int]]:
+        """
+        Merges the equal states, adding up their paths
+        """
+        merged: Dict[Key, Tuple[State, int]] = dict()
+        with self.stats.measure("merge"):
+            for state, paths in states:
+                vulnerabilities, uninitialized_variable_detector = state
+                key = (
+                    vulnerabilities.get_multilabelling().get_key(),
+                    uninitialized_variable_detector.get_key(),
+                )
+                if key in merged:
+                    self.retire(state)
+                    self.stats.count("merged_states")
+                    merged_state, merged_paths = merged[key]
+                    merged[key] = (merged_state, merged_paths + paths)
+                else:
+                    merged[key] = (state, paths)
+
+        return merged
+
+    def retire(self, state: State) -> None:
+        """
+        Collects the illegal flows found since a state was forked, when it
+        is no longer followed
+        """
+        vulnerabilities, _ = state
+        illegal_flows = vulnerabilities.get_illegal_flows()
+        self.stats.count("illegal_flows_found", len(illegal_flows))
+        for illegal_flow in illegal_flows:
+            self.stats.observe("sink_label_flows", len(illegal_flow.sanitized_flows))
+        with self.stats.measure("merge"):
+            self.flow_aggregator.update(illegal_flows)
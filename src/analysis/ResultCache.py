@@ -0,0 +1,239 @@
+import ast
+import hashlib
+import json
+import os
+import tempfile
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from domain.FlowAggregator import FlowAggregator, OnFinal
+from domain.IllegalFlow import IllegalFlow
+from domain.Pattern import Pattern
+from domain.Policy import Policy
+from domain.Vulnerability import Vulnerability
+
+from analysis.AnalysisStats import AnalysisStats
+from analysis.Analyser import Analyser
+
+
+class ResultCache:
+    """
+    On-disk cache of the illegal flows of slices, addressed by a hash of the
+    slice, the patterns of a vulnerability, the analysis mode and the version
+    of the analyser, a hash of its code.
+
+    The illegal flows of each vulnerability are cached separately, as the
+    labels of each pattern are computed independently. When patterns are
+    added or changed, only their vulnerabilities are analysed again.
+
+    The slice is hashed through its tree, keeping line numbers but not
+    columns, so edits to whitespace within a line and to comments do not
+    change its key. When the cache grows beyond its maximum size, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = 100 * 2**20) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+        # size of the cache directory, read when the first entry is added
+        self.size: Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def dump_tree(node) -> str:
+        """
+        Dumps a tree with the line number of each node but without columns
+        """
+        if isinstance(node, ast.AST):
+            fields = ", ".join(
+                ResultCache.dump_tree(getattr(node, field, None))
+                for field in node._fields
+            )
+            lineno = getattr(node, "lineno", None)
+            return f"{type(node).__name__}@{lineno}({fields})"
+        if isinstance(node, list):
+            return "[" + ", ".join(ResultCache.dump_tree(item) for item in node) + "]"
+        return repr(node)
+
+    @staticmethod
+    def dump_pattern(pattern: Pattern) -> str:
+        return json.dumps(
+            {
+                "vulnerability": pattern.get_vulnerability(),
+                "sources": sorted(pattern.get_sources()),
+                "sanitizers": sorted(pattern.get_sanitizers()),
+                "sinks": sorted(pattern.get_sinks()),
+                "implicit": pattern.consider_implicit(),
+            },
+            sort_keys=True,
+        )
+
+    @staticmethod
+    def dump_patterns(patterns: Iterable[Pattern]) -> str:
+        dumps = sorted(ResultCache.dump_pattern(pattern) for pattern in patterns)
+        return "[" + ", ".join(dumps) + "]"
+
+    @staticmethod
+    def hash_parts(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b"\0")
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_keys(
+        tree: ast.Module, policy: Policy, mode: str
+    ) -> Dict[Vulnerability, str]:
+        """
+        Returns the key of the illegal flows of each vulnerability of the
+        policy
+        """
+        patterns_by_vulnerability: Dict[Vulnerability, List[Pattern]] = dict()
+        for pattern in policy.get_patterns():
+            patterns_by_vulnerability.setdefault(
+                pattern.get_vulnerability(), []
+            ).append(pattern)
+
+        tree_hash = ResultCache.hash_parts(ResultCache.dump_tree(tree))
+        return {
+            vulnerability: ResultCache.hash_parts(
+                Analyser.get_version(),
+                mode,
+                ResultCache.dump_patterns(patterns),
+                tree_hash,
+            )
+            for vulnerability, patterns in patterns_by_vulnerability.items()
+        }
+
+    def get_entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[List[IllegalFlow]]:
+        entry_path = self.get_entry_path(key)
+        try:
+            with open(entry_path, "r") as f:
+                output = json.load(f)
+            # the modification time of an entry is the time of its last use
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [IllegalFlow.from_json(illegal_flow) for illegal_flow in output]
+
+    def put(self, key: str, illegal_flows: List[IllegalFlow]) -> None:
+        entry_path = self.get_entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        # entries are replaced atomically, as several processes share the cache
+        output = [illegal_flow.to_json() for illegal_flow in illegal_flows]
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path))
+        with os.fdopen(fd, "w") as f:
+            json.dump(output, f)
+        os.replace(temp_path, entry_path)
+
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.get_entries())
+        else:
+            self.size += os.path.getsize(entry_path)
+        if self.size > self.max_size:
+            self.evict()
+
+    def get_entries(self) -> List[Tuple[float, int, str]]:
+        """
+        Returns the modification time, size and path of every entry
+        """
+        entries = []
+        for directory, _, file_names in os.walk(self.cache_dir):
+            for file_name in file_names:
+                if not file_name.endswith(".json"):
+                    continue
+                entry_path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(entry_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        return entries
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until the cache fits its
+        maximum size
+        """
+        entries = sorted(self.get_entries())
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+            self.size -= size
+            self.evictions += 1
+
+    def analyse(
+        self,
+        analyser: Analyser,
+        tree: ast.Module,
+        stats: Optional[AnalysisStats] = None,
+        on_final: Optional[OnFinal] = None,
+    ) -> Tuple[List[IllegalFlow], bool]:
+        """
+        Returns the illegal flows of a slice, and whether they were all found
+        in the cache. The slice is analysed only for the vulnerabilities whose
+        illegal flows were not, passing the ones that are final before the
+        analysis ends to on_final.
+        """
+        keys = ResultCache.get_keys(tree, analyser.policy, analyser.mode)
+
+        flow_aggregator = FlowAggregator()
+        missing_vulnerabilities = set()
+        for vulnerability, key in keys.items():
+            illegal_flows = self.get(key)
+            if illegal_flows is None:
+                missing_vulnerabilities.add(vulnerability)
+            else:
+                flow_aggregator.update(illegal_flows)
+
+        if len(missing_vulnerabilities) > 0:
+            missing_policy = Policy(
+                {
+                    pattern
+                    for pattern in analyser.policy.get_patterns()
+                    if pattern.get_vulnerability() in missing_vulnerabilities
+                }
+            )
+            illegal_flows_by_vulnerability: Dict[
+                Vulnerability, List[IllegalFlow]
+            ] = {vulnerability: [] for vulnerability in missing_vulnerabilities}
+            missing_analyser = analyser.with_policy(missing_policy)
+            for illegal_flow in missing_analyser.analyse(tree, stats, on_final):
+                illegal_flows_by_vulnerability[
+                    illegal_flow.get_vulnerability()
+                ].append(illegal_flow)
+
+            for vulnerability, illegal_flows in illegal_flows_by_vulnerability.items():
+                # the illegal flows of a partial analysis are not cached
+                if not missing_analyser.stats.is_partial():
+                    self.put(keys[vulnerability], illegal_flows)
+                flow_aggregator.update(illegal_flows)
+
+        # merged in the same order as the illegal flows of a full analysis
+        return flow_aggregator.get_illegal_flows(), len(missing_vulnerabilities) == 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
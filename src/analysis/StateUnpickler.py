@@ -0,0 +1,31 @@
+import pickle
+
+
+class StateUnpickler(pickle.Unpickler):
+    """
+    Unpickles the state of an incremental analysis.
+
+    A pickle can call any function it names, so only the classes that a
+    state is made of are found, and a state file that names anything else
+    fails to load instead of running it.
+    """
+
+    CLASSES = {
+        ("analysis.AnalysisBudget", "AnalysisBudget"),
+        ("analysis.AnalysisStats", "AnalysisStats"),
+        ("analysis.IncrementalAnalyser", "IncrementalAnalyser"),
+        ("collections", "ChainMap"),
+        ("domain.Flow", "Flow"),
+        ("domain.IllegalFlow", "IllegalFlow"),
+        ("domain.LabelEncoding", "LabelEncoding"),
+        ("domain.MultiLabel", "MultiLabel"),
+        ("domain.MultiLabelling", "MultiLabelling"),
+        ("domain.Pattern", "Pattern"),
+        ("domain.Policy", "Policy"),
+        ("visitors.UninitializedVariableDetector", "UninitializedVariableDetector"),
+    }
+
+    def find_class(self, module: str, name: str):
+        if (module, name) not in StateUnpickler.CLASSES:
+            raise pickle.UnpicklingError(f"Unexpected class in state: {module}.{name}")
+        return super().find_class(module, name)
@@ -1,25 +1,34 @@
 import json
 
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 
 from domain.Sanitizer import Sanitizer
 
 
 class Flow:
-    def __init__(self, flow=None) -> None:
-        if flow is None:
-            flow = []
-        self.flow: List[Tuple[Sanitizer, int]] = flow
+    """
+    Sequence of sanitizers that intercepted the information along a flow.
 
-    def add_sanitizer(self, sanitizer: Sanitizer, lineno: int) -> None:
-        if (sanitizer, lineno) not in self.flow:
-            self.flow.append((sanitizer, lineno))
+    Flows are immutable values: adding a sanitizer returns a new flow, so
+    flows can be hashed and shared between labels.
+    """
+
+    __slots__ = ("flow", "hash")
+
+    def __init__(self, flow: Iterable[Tuple[Sanitizer, int]] = ()) -> None:
+        self.flow: Tuple[Tuple[Sanitizer, int], ...] = tuple(flow)
+        self.hash = hash(self.flow)
+
+    def add_sanitizer(self, sanitizer: Sanitizer, lineno: int) -> "Flow":
+        if (sanitizer, lineno) in self.flow:
+            return self
+        return Flow(self.flow + ((sanitizer, lineno),))
 
     def is_empty(self) -> bool:
         return len(self.flow) == 0
 
     def to_json(self) -> List:
-        return self.flow
+        return list(self.flow)
 
     def __repr__(self) -> str:
         return json.dumps(self.to_json(), indent=2)
@@ -28,15 +37,11 @@ class Flow:
         if not isinstance(other, Flow):
             return False
 
-        if len(self.flow) != len(other.flow):
-            return False
-
-        for i in range(len(self.flow)):
-            if self.flow[i] != other.flow[i]:
-                return False
-
-        return True
+        return self.hash == other.hash and self.flow == other.flow
 
     def __hash__(self) -> int:
-        # TODO: performs badly
-        return 0
+        return self.hash
+
+    def __reduce__(self):
+        # string hashes differ between processes, so they are not pickled
+        return (Flow, (self.flow,))
@@ -0,0 +1,103 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from domain.Flow import Flow
+from domain.IllegalFlow import IllegalFlow
+
+# receives the merged illegal flows that no longer change during an analysis
+OnFinal = Callable[[List[IllegalFlow]], None]
+
+
+class FlowAggregator:
+    """
+    Merges the illegal flows of a vulnerability between the same source and
+    sink into a single illegal flow.
+
+    Illegal flows can be added as soon as they are found, and the
+    aggregators of different paths or workers can be merged. The merged
+    illegal flows are returned in a deterministic order.
+
+    An analysis that finds the illegal flows in the order of the lines of
+    their sinks can also pass each merged illegal flow to on_final as soon
+    as no more flows can be added to it.
+    """
+
+    def __init__(self, on_final: Optional[OnFinal] = None) -> None:
+        self.on_final = on_final
+        self.unsanitized_flows: Dict[Tuple, bool] = dict()
+        self.sanitized_flows: Dict[Tuple, Set[Flow]] = dict()
+        # keys of the illegal flows passed to on_final
+        self.final: Set[Tuple] = set()
+
+    def add(self, illegal_flow: IllegalFlow) -> None:
+        key = illegal_flow.get_key()
+        if key not in self.sanitized_flows:
+            self.unsanitized_flows[key] = False
+            self.sanitized_flows[key] = set()
+
+        self.unsanitized_flows[key] |= illegal_flow.unsanitized_flows
+        self.sanitized_flows[key].update(illegal_flow.sanitized_flows)
+
+    def update(self, illegal_flows: Iterable[IllegalFlow]) -> None:
+        for illegal_flow in illegal_flows:
+            self.add(illegal_flow)
+
+    def merge(self, other: "FlowAggregator") -> None:
+        for key, sanitized_flows in other.sanitized_flows.items():
+            if key not in self.sanitized_flows:
+                self.unsanitized_flows[key] = False
+                self.sanitized_flows[key] = set()
+
+            self.unsanitized_flows[key] |= other.unsanitized_flows[key]
+            self.sanitized_flows[key].update(sanitized_flows)
+
+    def get_illegal_flow(self, key: Tuple) -> IllegalFlow:
+        vulnerability, source, source_lineno, sink, sink_lineno = key
+        return IllegalFlow(
+            vulnerability,
+            source,
+            source_lineno,
+            sink,
+            sink_lineno,
+            self.unsanitized_flows[key],
+            sorted(self.sanitized_flows[key], key=lambda flow: flow.flow),
+        )
+
+    def get_illegal_flows(self) -> List[IllegalFlow]:
+        return [self.get_illegal_flow(key) for key in sorted(self.sanitized_flows)]
+
+    def finalize(self, lineno: int) -> None:
+        """
+        Passes the merged illegal flows whose sinks are before the given line
+        to on_final, once the analysis can no longer find flows to them
+        """
+        if self.on_final is None:
+            return
+
+        # the key of an illegal flow ends with the line of its sink
+        keys = sorted(
+            key
+            for key in self.sanitized_flows
+            if key[-1] < lineno and key not in self.final
+        )
+        if len(keys) > 0:
+            self.final.update(keys)
+            self.on_final([self.get_illegal_flow(key) for key in keys])
+
+    def __len__(self) -> int:
+        return len(self.sanitized_flows)
+
+    def __getstate__(self):
+        # flows are sent between processes as plain tuples
+        return [
+            (key, self.unsanitized_flows[key], [flow.flow for flow in flows])
+            for key, flows in self.sanitized_flows.items()
+        ]
+
+    def __setstate__(self, state) -> None:
+        self.on_final = None
+        self.unsanitized_flows = dict()
+        self.sanitized_flows = dict()
+        self.final = set()
+        for key, unsanitized_flows, flows in state:
+            self.unsanitized_flows[key] = unsanitized_flows
+            self.sanitized_flows[key] = {Flow(flow) for flow in flows}
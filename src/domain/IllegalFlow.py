@@ -1,6 +1,6 @@
 import json
 
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from domain.Flow import Flow
 
 from domain.Vulnerability import Vulnerability
@@ -9,6 +9,17 @@ from domain.Sink import Sink
 
 
 class IllegalFlow:
+    __slots__ = (
+        "vulnerability",
+        "source",
+        "source_lineno",
+        "sink",
+        "sink_lineno",
+        "unsanitized_flows",
+        "sanitized_flows",
+        "hash",
+    )
+
     def __init__(
         self,
         vulnerability: Vulnerability,
@@ -26,19 +37,36 @@ class IllegalFlow:
         self.sink_lineno = sink_lineno
         self.unsanitized_flows = unsanitized_flows
         self.sanitized_flows = sanitized_flows
+        self.hash = hash(
+            (
+                vulnerability,
+                source,
+                source_lineno,
+                sink,
+                sink_lineno,
+                unsanitized_flows,
+                frozenset(sanitized_flows),
+            )
+        )
 
     def get_vulnerability(self) -> Vulnerability:
         return self.vulnerability
 
-    def is_combinable(self, other) -> bool:
+    def get_key(self) -> Tuple[Vulnerability, Source, int, Sink, int]:
+        """
+        Identifies the illegal flows that can be combined with this one.
+        """
         return (
-            self.vulnerability == other.vulnerability
-            and self.source == other.source
-            and self.source_lineno == other.source_lineno
-            and self.sink == other.sink
-            and self.sink_lineno == other.sink_lineno
+            self.vulnerability,
+            self.source,
+            self.source_lineno,
+            self.sink,
+            self.sink_lineno,
         )
 
+    def is_combinable(self, other) -> bool:
+        return self.get_key() == other.get_key()
+
     def combine(self, other) -> "IllegalFlow":
         assert self.is_combinable(other)
         return IllegalFlow(
@@ -65,25 +93,50 @@ class IllegalFlow:
             ),
         }
 
+    @classmethod
+    def from_json(cls, json_data) -> "IllegalFlow":
+        unsanitized_flows = json_data["unsanitized_flows"] == "yes"
+        sanitized_flows = [
+            Flow((sanitizer, lineno) for sanitizer, lineno in flow)
+            for flow in json_data["sanitized_flows"]
+        ]
+        if unsanitized_flows:
+            sanitized_flows.insert(0, Flow())
+
+        return cls(
+            Vulnerability(json_data["vulnerability"]),
+            Source(json_data["source"][0]),
+            json_data["source"][1],
+            Sink(json_data["sink"][0]),
+            json_data["sink"][1],
+            unsanitized_flows,
+            sanitized_flows,
+        )
+
     def __repr__(self) -> str:
         return json.dumps(self.to_json())
 
     def __eq__(self, other) -> bool:
-        if len(self.sanitized_flows) != len(other.sanitized_flows):
+        if not isinstance(other, IllegalFlow):
             return False
 
-        for i in range(len(self.sanitized_flows)):
-            if self.sanitized_flows[i] != other.sanitized_flows[i]:
-                return False
-
         return (
-            self.vulnerability == other.vulnerability
+            self.hash == other.hash
+            and self.vulnerability == other.vulnerability
             and self.source == other.source
             and self.source_lineno == other.source_lineno
             and self.sink == other.sink
             and self.sink_lineno == other.sink_lineno
             and self.unsanitized_flows == other.unsanitized_flows
+            and set(self.sanitized_flows) == set(other.sanitized_flows)
         )
 
     def __hash__(self) -> int:
-        return 0
+        return self.hash
+
+    def __reduce__(self):
+        # string hashes differ between processes, so they are not pickled
+        return (
+            IllegalFlow,
+            (*self.get_key(), self.unsanitized_flows, self.sanitized_flows),
+        )
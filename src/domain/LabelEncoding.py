@@ -0,0 +1,166 @@
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from domain.Flow import Flow
+from domain.MultiLabel import MultiLabel
+from domain.Pattern import Pattern
+from domain.Sanitizer import Sanitizer
+from domain.Source import Source
+
+# an empty flow, of information that has not been sanitized yet
+EMPTY_FLOW = Flow()
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """
+    Yields the indices of the bits that are set, lowest first
+    """
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class LabelEncoding:
+    """
+    Numbers the sources and the flows found by an analysis, so that
+    multi-labels are sets of bits.
+
+    Each occurrence of a source of a pattern (the pattern, the source and
+    its line) and each flow of a pattern from a source (the pattern, the
+    source and the sanitizers that intercepted it) gets a bit the first time
+    it is found. Multi-labels are combined with a bitwise or, and are only
+    decoded into sources and flows to build illegal flows.
+
+    An encoding is shared by all the states of an analysis, and must be kept
+    with the multi-labels it encoded.
+    """
+
+    def __init__(self) -> None:
+        self.sources: List[Tuple[Pattern, Source, int]] = []
+        self.source_bits: Dict[Tuple[Pattern, Source, int], int] = dict()
+        self.flows: List[Tuple[Pattern, Source, Flow]] = []
+        self.flow_bits: Dict[Tuple[Pattern, Source, Flow], int] = dict()
+
+        # bits of the sources of each pattern
+        self.pattern_sources: Dict[Pattern, int] = dict()
+        # bits of the flows of each pattern, and of each pattern from a source
+        self.pattern_flows: Dict[Pattern, int] = dict()
+        self.source_flows: Dict[Tuple[Pattern, Source], int] = dict()
+        # flow after a sanitizer intercepts each flow
+        self.sanitized_flows: Dict[Tuple[int, Sanitizer, int], int] = dict()
+
+    def get_source_bit(self, pattern: Pattern, source: Source, lineno: int) -> int:
+        key = (pattern, source, lineno)
+        bit = self.source_bits.get(key)
+        if bit is None:
+            bit = 1 << len(self.sources)
+            self.sources.append(key)
+            self.source_bits[key] = bit
+            self.pattern_sources[pattern] = self.pattern_sources.get(pattern, 0) | bit
+        return bit
+
+    def get_flow_bit(self, pattern: Pattern, source: Source, flow: Flow) -> int:
+        key = (pattern, source, flow)
+        bit = self.flow_bits.get(key)
+        if bit is None:
+            bit = 1 << len(self.flows)
+            self.flows.append(key)
+            self.flow_bits[key] = bit
+            self.pattern_flows[pattern] = self.pattern_flows.get(pattern, 0) | bit
+            self.source_flows[(pattern, source)] = (
+                self.source_flows.get((pattern, source), 0) | bit
+            )
+        return bit
+
+    def source_multi_label(
+        self, source: Source, lineno: int, patterns: Iterable[Pattern]
+    ) -> MultiLabel:
+        """
+        Returns the multi-label of a source of the given patterns, with a
+        flow that has not been sanitized yet
+        """
+        sources = 0
+        flows = 0
+        for pattern in patterns:
+            sources |= self.get_source_bit(pattern, source, lineno)
+            flows |= self.get_flow_bit(pattern, source, EMPTY_FLOW)
+        return MultiLabel(sources, flows)
+
+    def add_sources(self, multi_label: MultiLabel, other: MultiLabel) -> MultiLabel:
+        """
+        Returns a multi-label with the sources of both multi-labels, where
+        the flows of the multi-label from the sources of the other one are
+        dropped. The information of a call to a function comes from its
+        arguments, and their flows are combined with it later.
+        """
+        if other.sources == 0:
+            return multi_label
+
+        dropped_flows = 0
+        for index in iter_bits(other.sources):
+            pattern, source, _ = self.sources[index]
+            dropped_flows |= self.source_flows.get((pattern, source), 0)
+
+        return MultiLabel(
+            multi_label.sources | other.sources, multi_label.flows & ~dropped_flows
+        )
+
+    def add_sanitizer(
+        self,
+        multi_label: MultiLabel,
+        sanitizer: Sanitizer,
+        lineno: int,
+        patterns: Iterable[Pattern],
+    ) -> MultiLabel:
+        """
+        Returns a multi-label where the flows of the given patterns are
+        intercepted by a sanitizer
+        """
+        pattern_flows = 0
+        for pattern in patterns:
+            pattern_flows |= self.pattern_flows.get(pattern, 0)
+
+        flows = multi_label.flows & pattern_flows
+        if flows == 0:
+            return multi_label
+
+        sanitized_flows = 0
+        for index in iter_bits(flows):
+            key = (index, sanitizer, lineno)
+            bit = self.sanitized_flows.get(key)
+            if bit is None:
+                pattern, source, flow = self.flows[index]
+                bit = self.get_flow_bit(
+                    pattern, source, flow.add_sanitizer(sanitizer, lineno)
+                )
+                self.sanitized_flows[key] = bit
+            sanitized_flows |= bit
+
+        return MultiLabel(
+            multi_label.sources, multi_label.flows & ~flows | sanitized_flows
+        )
+
+    def reencode(self, multi_label: MultiLabel, other: "LabelEncoding") -> MultiLabel:
+        """
+        Returns the multi-label with the same sources and flows in another
+        encoding, which numbers the ones it has not seen yet
+        """
+        sources = 0
+        for index in iter_bits(multi_label.sources):
+            sources |= other.get_source_bit(*self.sources[index])
+        flows = 0
+        for index in iter_bits(multi_label.flows):
+            flows |= other.get_flow_bit(*self.flows[index])
+        return MultiLabel(sources, flows)
+
+    def get_sources(
+        self, multi_label: MultiLabel, pattern: Pattern
+    ) -> List[Tuple[Source, int]]:
+        sources = multi_label.sources & self.pattern_sources.get(pattern, 0)
+        return [self.sources[index][1:] for index in iter_bits(sources)]
+
+    def get_flows_from_source(
+        self, multi_label: MultiLabel, pattern: Pattern, source: Source
+    ) -> List[Flow]:
+        flows = multi_label.flows & self.source_flows.get((pattern, source), 0)
+        return [self.flows[index][2] for index in iter_bits(flows)]
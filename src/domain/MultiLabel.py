@@ -1,51 +1,52 @@
 import json
 
-from typing import Dict, Set
-
-from domain.Label import Label
-from domain.Pattern import Pattern
+from typing import Dict
 
 
 class MultiLabel:
     """
-    Generalizes the Label class in order to be able to represent distinct labels
-    corresponding to different patterns.
+    Represents the integrity of information for each pattern: the sources
+    that might have influenced it, and which sanitizers might have
+    intercepted it since its flow from each source.
+
+    The sources and the flows are sets of bits, numbered by the label
+    encoding of the analysis, so combining multi-labels is a bitwise or.
+    Multi-labels are immutable.
     """
 
-    def __init__(self, mapping=None) -> None:
-        if mapping is None:
-            mapping = {}
-        self.mapping = mapping
+    # number of calls of each method, for the stats of the analysis. The
+    # counts are kept in a dictionary because assigning to an attribute of
+    # the class would invalidate the attribute caches of the interpreter.
+    calls = {"combine": 0}
 
-    def get_patterns(self) -> Set[Pattern]:
-        return set(self.mapping.keys())
+    __slots__ = ("sources", "flows")
 
-    def get_label(self, pattern: Pattern) -> Label:
-        if pattern not in self.mapping:
-            return Label()
-        return self.mapping[pattern]
+    def __init__(self, sources: int = 0, flows: int = 0) -> None:
+        self.sources = sources
+        self.flows = flows
 
-    def add_label(self, label: Label, pattern: Pattern) -> None:
-        self.mapping[pattern] = label
+    def is_empty(self) -> bool:
+        return self.sources == 0 and self.flows == 0
 
     def combine(self, other: "MultiLabel") -> "MultiLabel":
-        new_mapping = {}
-        patterns = self.get_patterns().union(other.get_patterns())
-
-        for pattern in patterns:
-            new_mapping[pattern] = self.get_label(pattern).combine(
-                other.get_label(pattern)
-            )
+        MultiLabel.calls["combine"] += 1
+        sources = self.sources | other.sources
+        flows = self.flows | other.flows
+        if sources == self.sources and flows == self.flows:
+            return self
+        if sources == other.sources and flows == other.flows:
+            return other
 
-        return MultiLabel(new_mapping)
+        return MultiLabel(sources, flows)
 
     def to_json(self) -> Dict:
-        return {
-            "mapping": [
-                (pattern.to_json(), label.to_json())
-                for pattern, label in self.mapping.items()
-            ]
-        }
+        return {"sources": self.sources, "flows": self.flows}
 
     def __repr__(self) -> str:
         return json.dumps(self.to_json(), indent=2)
+
+    def __eq__(self, other) -> bool:
+        return self.sources == other.sources and self.flows == other.flows
+
+    def __hash__(self) -> int:
+        return hash((self.sources, self.flows))
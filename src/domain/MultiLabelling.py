@@ -1,19 +1,30 @@
+from collections import ChainMap
 import json
 
-from typing import Dict, Set
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
 
 from domain.MultiLabel import MultiLabel
 from domain.Variable import Variable
-from domain.Pattern import Pattern
 
 
 class MultiLabelling:
     """
     Maps variables to multilabels.
+
+    Multilabellings are forked in constant time: the mapping is a chain of
+    scopes, and forking freezes the current scopes, which are then shared by
+    both multilabellings while each one writes to a new scope of its own.
     """
 
-    def __init__(self, mapping: Dict[Variable, MultiLabel] = dict()) -> None:
-        self.mapping = mapping
+    # number of scopes after which the chain is flattened into a single one
+    MAX_SCOPES = 32
+
+    __slots__ = ("mapping",)
+
+    def __init__(self, mapping: Optional[Dict[Variable, MultiLabel]] = None) -> None:
+        if mapping is None:
+            mapping = dict()
+        self.mapping = ChainMap(mapping)
 
     def has_multi_label(self, name: Variable) -> bool:
         return name in self.mapping
@@ -23,15 +34,74 @@ class MultiLabelling:
             return MultiLabel()
         return self.mapping[name]
 
-    def get_multi_labels(self) -> Set[MultiLabel]:
-        return set(self.mapping.values())
+    def get_multi_labels(self) -> List[MultiLabel]:
+        return list(self.mapping.values())
 
     def add_multi_label(self, multilabel: MultiLabel, name: Variable) -> None:
         self.mapping[name] = multilabel
 
-    def get_patterns(self) -> Set[Pattern]:
-        return set.union(
-            *[multi_label.get_patterns() for multi_label in self.get_multi_labels()]
+    def fork(self) -> "MultiLabelling":
+        """
+        Return a multilabelling whose variables can be relabelled
+        independently of this one.
+        """
+        if len(self.mapping.maps) > MultiLabelling.MAX_SCOPES:
+            self.mapping = ChainMap(dict(self.mapping))
+
+        scopes = self.mapping.maps
+        if len(scopes[0]) == 0:
+            scopes = scopes[1:]
+
+        self.mapping = ChainMap(dict(), *scopes)
+        multilabelling = MultiLabelling()
+        multilabelling.mapping = ChainMap(dict(), *scopes)
+
+        return multilabelling
+
+    def map_multi_labels(
+        self,
+        function: Callable[[MultiLabel], MultiLabel],
+        mapped_scopes: Dict[int, Dict[Variable, MultiLabel]],
+    ) -> "MultiLabelling":
+        """
+        Return a multilabelling where function is applied to each multilabel.
+        The scopes mapped for other multilabellings, by id, are shared with
+        them.
+        """
+        scopes = []
+        for scope in self.mapping.maps:
+            if id(scope) not in mapped_scopes:
+                mapped_scopes[id(scope)] = {
+                    name: function(multilabel) for name, multilabel in scope.items()
+                }
+            scopes.append(mapped_scopes[id(scope)])
+
+        multilabelling = MultiLabelling()
+        multilabelling.mapping = ChainMap(*scopes)
+        return multilabelling
+
+    def join(self, other: "MultiLabelling") -> "MultiLabelling":
+        """
+        Return a new MultiLabelling where each variable is mapped to the
+        combination of its multi-labels in both multi-labellings.
+        """
+        names = self.mapping.keys() | other.mapping.keys()
+        return MultiLabelling(
+            {
+                name: self.get_multi_label(name).combine(other.get_multi_label(name))
+                for name in names
+            }
+        )
+
+    def get_key(self) -> FrozenSet[Tuple[Variable, MultiLabel]]:
+        """
+        Identifies the multilabellings that are equal to this one, where
+        variables with empty multi-labels are equal to missing ones.
+        """
+        return frozenset(
+            (name, multilabel)
+            for name, multilabel in self.mapping.items()
+            if not multilabel.is_empty()
         )
 
     def to_json(self) -> Dict:
@@ -44,3 +114,10 @@ class MultiLabelling:
 
     def __repr__(self) -> str:
         return json.dumps(self.to_json(), indent=2)
+
+    def __eq__(self, other) -> bool:
+        names = self.mapping.keys() | other.mapping.keys()
+        return all(
+            self.get_multi_label(name) == other.get_multi_label(name)
+            for name in names
+        )
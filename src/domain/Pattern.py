@@ -9,6 +9,8 @@ from domain.Vulnerability import Vulnerability
 
 
 class Pattern:
+    __slots__ = ("vulnerability", "sources", "sanitizers", "sinks", "implicit")
+
     def __init__(
         self,
         vulnerability: Vulnerability,
@@ -29,6 +31,12 @@ class Pattern:
     def get_sources(self) -> Set[Source]:
         return self.sources
 
+    def get_sanitizers(self) -> Set[Sanitizer]:
+        return self.sanitizers
+
+    def get_sinks(self) -> Set[Sink]:
+        return self.sinks
+
     def has_source(self, source: Source) -> bool:
         return source in self.sources
 
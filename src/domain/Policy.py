@@ -1,17 +1,52 @@
 import json
 
-from typing import Dict, Set
+from typing import Dict, List, Set
 
 from domain.Pattern import Pattern
+from domain.Sanitizer import Sanitizer
+from domain.Sink import Sink
+from domain.Source import Source
 
 
 class Policy:
+    """
+    Set of vulnerability patterns to check a slice against.
+
+    The patterns are indexed by their sources, sanitizers and sinks when the
+    policy is created, so the patterns of an identifier are found with a
+    single lookup.
+    """
+
     def __init__(self, patterns: Set[Pattern]) -> None:
         self.patterns = patterns
 
+        self.patterns_by_source: Dict[Source, List[Pattern]] = dict()
+        self.patterns_by_sanitizer: Dict[Sanitizer, List[Pattern]] = dict()
+        self.patterns_by_sink: Dict[Sink, List[Pattern]] = dict()
+        for pattern in patterns:
+            for source in pattern.get_sources():
+                self.patterns_by_source.setdefault(source, []).append(pattern)
+            for sanitizer in pattern.get_sanitizers():
+                self.patterns_by_sanitizer.setdefault(sanitizer, []).append(pattern)
+            for sink in pattern.get_sinks():
+                self.patterns_by_sink.setdefault(sink, []).append(pattern)
+
     def get_patterns(self) -> Set[Pattern]:
         return self.patterns
 
+    def get_patterns_with_source(self, source: Source) -> List[Pattern]:
+        return self.patterns_by_source.get(source, [])
+
+    def get_patterns_with_sanitizer(self, sanitizer: Sanitizer) -> List[Pattern]:
+        return self.patterns_by_sanitizer.get(sanitizer, [])
+
+    def get_patterns_with_sink(self, sink: Sink) -> List[Pattern]:
+        return self.patterns_by_sink.get(sink, [])
+
+    @classmethod
+    def from_json(cls, json_data) -> "Policy":
+        return cls({Pattern.from_json(pattern) for pattern in json_data})
+
     def to_json(self) -> Dict:
         return {"patterns": [pattern.to_json() for pattern in self.patterns]}
 
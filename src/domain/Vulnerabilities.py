@@ -1,12 +1,15 @@
 import json
 
-from typing import Dict, Set
+from typing import Dict, List, Optional, Set
 
+from domain.LabelEncoding import LabelEncoding
 from domain.MultiLabel import MultiLabel
 from domain.MultiLabelling import MultiLabelling
 from domain.Pattern import Pattern
 from domain.Policy import Policy
+from domain.Sanitizer import Sanitizer
 from domain.Sink import Sink
+from domain.Source import Source
 from domain.Variable import Variable
 from domain.IllegalFlow import IllegalFlow
 
@@ -17,14 +20,56 @@ class Vulnerabilities:
     of the slice.
     """
 
-    def __init__(self, policy: Policy) -> None:
+    __slots__ = ("policy", "multilabelling", "label_encoding", "illegal_flows")
+
+    def __init__(
+        self,
+        policy: Policy,
+        multilabelling: Optional[MultiLabelling] = None,
+        label_encoding: Optional[LabelEncoding] = None,
+    ) -> None:
+        if multilabelling is None:
+            multilabelling = MultiLabelling()
+        if label_encoding is None:
+            label_encoding = LabelEncoding()
         self.policy = policy
-        self.multilabelling = MultiLabelling()
+        self.multilabelling = multilabelling
+        self.label_encoding = label_encoding
         self.illegal_flows: Set[IllegalFlow] = set()
 
+    def fork(self) -> "Vulnerabilities":
+        """
+        Return a copy of the state of the analysis in constant time.
+
+        The policy and the label encoding are shared and the multilabelling
+        is forked. The fork starts without illegal flows, and collects the
+        ones found after it.
+        """
+        return Vulnerabilities(
+            self.policy, self.multilabelling.fork(), self.label_encoding
+        )
+
     def get_patterns(self) -> Set[Pattern]:
         return self.policy.get_patterns()
 
+    def get_patterns_with_source(self, source: Source) -> List[Pattern]:
+        return self.policy.get_patterns_with_source(source)
+
+    def get_patterns_with_sanitizer(self, sanitizer: Sanitizer) -> List[Pattern]:
+        return self.policy.get_patterns_with_sanitizer(sanitizer)
+
+    def get_patterns_with_sink(self, sink: Sink) -> List[Pattern]:
+        return self.policy.get_patterns_with_sink(sink)
+
+    def get_label_encoding(self) -> LabelEncoding:
+        return self.label_encoding
+
+    def get_multilabelling(self) -> MultiLabelling:
+        return self.multilabelling
+
+    def set_multilabelling(self, multilabelling: MultiLabelling) -> None:
+        self.multilabelling = multilabelling
+
     def has_multi_label(self, variable: Variable) -> bool:
         return self.multilabelling.has_multi_label(variable)
 
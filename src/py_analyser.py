@@ -1,115 +1,411 @@
+import argparse
 import ast
-from copy import deepcopy
+import asyncio
+import os
 import sys
 import json
-import os
-import itertools
+import time
+import tracemalloc
 
 from domain.Policy import Policy
-from domain.Pattern import Pattern
-from domain.Vulnerabilities import Vulnerabilities
 
-from visitors.ControlFlowNodeCounter import ControlFlowNodeCounter
-from visitors.NodeProcessor import NodeProcessor
-from visitors.ControlFlowTransformer import ControlFlowTransformer
-from visitors.UninitializedVariableDetector import UninitializedVariableDetector
+from analysis.Analyser import Analyser
+from analysis.AnalysisClient import AnalysisClient
+from analysis.AnalysisBudget import AnalysisBudget
+from analysis.AnalysisServer import AnalysisServer
+from analysis.AnalysisStats import AnalysisStats
+from analysis.AsyncAnalysisService import AsyncAnalysisService
+from analysis.BatchAnalyser import BatchAnalyser
+from analysis.IncrementalAnalyser import IncrementalAnalyser
+from analysis.OutputWriter import OutputWriter
+from analysis.ParallelAnalyser import ParallelAnalyser
+from analysis.ParallelBatchAnalyser import ParallelBatchAnalyser
+from analysis.ResultCache import ResultCache
+
+
+USAGE = """python3 py-analyser.py <slice>.py <pattern>.json [--mode MODE] [--jobs N] \
+[--cache-dir DIR] [--state FILE] [--format FORMAT] [--output FILE]
+       python3 py-analyser.py --batch <slices> [<slices> ...] \
+--patterns <pattern>.json [<pattern>.json ...] [--mode MODE] [--jobs N] \
+[--timeout SECONDS] [--cache-dir DIR] [--format FORMAT]
+       python3 py-analyser.py --serve <address> [--timeout SECONDS] [--slice-root DIR]
+       python3 py-analyser.py --serve-async <address> --patterns <pattern>.json \
+[--mode MODE] [--jobs N] [--timeout SECONDS] [--max-pending N] [--slice-root DIR]
+       python3 py-analyser.py <slice>.py <pattern>.json --connect <address> \
+[--mode MODE]"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="py_analyser.py", usage=USAGE)
+    parser.add_argument("slice", nargs="?")
+    parser.add_argument("patterns", nargs="?")
+    parser.add_argument(
+        "--mode",
+        choices=Analyser.MODES,
+        default="paths",
+        help="analyse every combination of branches (paths), explore them "
+        "depth-first with the same result (explore), or join the branches of "
+        "each if and while statement (fixpoint), which finds at least the "
+        "illegal flows of paths but may report more",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes that analyse the paths of a slice "
+        "(--mode paths only), or the slices of a batch",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="seconds after which a slice of a batch, or a request to --serve-async, "
+        "is reported as failed, and after which the analysis of a request to "
+        "--serve stops and returns the illegal flows found until then",
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="+",
+        metavar="SLICES",
+        help="analyse every slice in the given directories, glob patterns or "
+        "manifest files (one slice path per line)",
+    )
+    parser.add_argument(
+        "--patterns",
+        nargs="+",
+        dest="pattern_files",
+        metavar="PATTERNS",
+        help="pattern files whose patterns are checked in batch mode and by "
+        "--serve-async",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="directory where the illegal flows of analysed slices are cached",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=100,
+        metavar="MB",
+        help="size of the cache above which the least recently used results "
+        "are evicted",
+    )
+    parser.add_argument(
+        "--state",
+        metavar="FILE",
+        help="file where the state of the analysis of the slice is kept, so the "
+        "next analysis starts from the first statement that changed "
+        "(fixpoint mode only)",
+    )
+    parser.add_argument(
+        "--max-paths",
+        type=int,
+        metavar="N",
+        help="stop analysing a slice after N paths and write the illegal flows "
+        "found until then, marked as partial",
+    )
+    parser.add_argument(
+        "--max-time",
+        type=float,
+        metavar="SECONDS",
+        help="stop analysing a slice after SECONDS and write the illegal flows "
+        "found until then, marked as partial",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        metavar="MB",
+        help="stop analysing a slice when the analyser uses more than MB of "
+        "memory and write the illegal flows found until then, marked as partial",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OutputWriter.FORMATS,
+        default="json",
+        help="write the illegal flows as an indented JSON list (json) or as one "
+        "JSON object per line (jsonl), streamed as soon as they are final",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="write the illegal flows of the slice to FILE, or to the standard "
+        "output if FILE is -, instead of output/<slice>.output.<format>",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="write the time of each stage of the analysis and counts of its "
+        "events to output/<slice>.stats.json",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="like --stats, and also measure the memory allocated in each "
+        "stage, which slows the analysis down",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="ADDRESS",
+        help="keep running and analyse the slices sent by clients to a Unix "
+        "socket or host:port",
+    )
+    parser.add_argument(
+        "--serve-async",
+        metavar="ADDRESS",
+        help="keep running and analyse the slices sent by clients to a Unix "
+        "socket or host:port in batches, with the policy of --patterns",
+    )
+    parser.add_argument(
+        "--slice-root",
+        metavar="DIR",
+        help="directory of the slices that clients of --serve and --serve-async "
+        "can send by path instead of by source",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=1024,
+        metavar="N",
+        help="number of slices waiting for analysis after which --serve-async "
+        "stops reading requests",
+    )
+    parser.add_argument(
+        "--connect",
+        metavar="ADDRESS",
+        help="send the slice to the --serve server listening on a Unix socket "
+        "or host:port",
+    )
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        return args
+    if args.serve_async is not None:
+        if args.pattern_files is None:
+            parser.error("--serve-async requires --patterns")
+        return args
+    if args.batch is None and (args.slice is None or args.patterns is None):
+        parser.error("a slice and a pattern file are required")
+    if args.batch is not None and args.pattern_files is None:
+        parser.error("--batch requires --patterns")
+    if args.state is not None and (args.batch is not None or args.mode != "fixpoint"):
+        parser.error("--state requires a single slice and --mode fixpoint")
+    if args.output is not None and args.batch is not None:
+        parser.error("--output requires a single slice")
+    if args.batch is None and args.jobs > 1 and args.mode != "paths":
+        parser.error("--jobs with a single slice requires --mode paths")
+    if args.connect is not None:
+        local_options = {
+            "--batch": args.batch is not None,
+            "--jobs": args.jobs > 1,
+            "--cache-dir": args.cache_dir is not None,
+            "--state": args.state is not None,
+            "--max-paths": args.max_paths is not None,
+            "--max-time": args.max_time is not None,
+            "--max-memory": args.max_memory is not None,
+            "--format jsonl": args.format == "jsonl",
+            "--stats": args.stats,
+            "--profile": args.profile,
+        }
+        for option, given in local_options.items():
+            if given:
+                parser.error(f"{option} cannot be used with --connect")
+
+    return args
+
+
+def read_patterns(pattern_paths):
+    patterns_json = []
+    try:
+        for pattern_path in pattern_paths:
+            with open(pattern_path, "r") as f:
+                patterns_json += json.load(f)
+    except FileNotFoundError:
+        print("Pattern file not found", file=sys.stderr)
+        sys.exit(1)
+
+    return patterns_json
+
+
+def read_policy(pattern_paths):
+    return Policy.from_json(read_patterns(pattern_paths))
+
+
+def make_result_cache(args):
+    if args.cache_dir is None:
+        return None
+    return ResultCache(args.cache_dir, args.cache_size * 2**20)
+
+
+def make_budget(args):
+    if args.max_paths is None and args.max_time is None and args.max_memory is None:
+        return None
+    return AnalysisBudget(
+        args.max_paths,
+        args.max_time,
+        args.max_memory * 2**20 if args.max_memory is not None else None,
+    )
+
+
+def make_analyser(policy, args):
+    if args.jobs > 1:
+        return ParallelAnalyser(policy, args.mode, args.jobs, make_budget(args))
+    return Analyser(policy, args.mode, make_budget(args))
+
+
+def exit_on_broken_pipe():
+    """
+    Exits quietly when the reader of the standard output stopped reading
+    """
+    # the standard output is flushed again at exit, which would fail too
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.exit(1)
+
+
+def analyse_slice(tree, policy, args, stats, result_cache, on_final=None):
+    """
+    Returns the illegal flows of the slice and whether they were cached
+    """
+    if args.state is not None:
+        analyser = IncrementalAnalyser.load(args.state, policy, make_budget(args))
+        illegal_flows = analyser.analyse(tree, stats, on_final)
+        analyser.save(args.state)
+        return illegal_flows, False
+
+    analyser = make_analyser(policy, args)
+    if result_cache is not None:
+        return result_cache.analyse(analyser, tree, stats, on_final)
+    return analyser.analyse(tree, stats, on_final), False
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print(
-            "Usage: python3 py-analyser.py <slice>.py <pattern>.json", file=sys.stderr
+    args = parse_args()
+
+    if args.serve is not None:
+        try:
+            AnalysisServer(
+                args.serve, args.slice_root, make_budget(args), args.timeout
+            ).serve_forever()
+        except KeyboardInterrupt:
+            pass
+        except FileExistsError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.serve_async is not None:
+        service = AsyncAnalysisService(
+            read_policy(args.pattern_files),
+            args.mode,
+            jobs=args.jobs,
+            max_concurrency=args.max_pending,
+            timeout=args.timeout,
+            budget=make_budget(args),
+            slice_root=args.slice_root,
         )
-        sys.exit(1)
 
-    SLICE_PATH = sys.argv[1]
-    PATTERN_PATH = sys.argv[2]
+        async def serve():
+            async with service:
+                await service.serve(args.serve_async)
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        except FileExistsError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
 
-    SLICE_NAME = SLICE_PATH.split("/")[-1].split(".")[0]
+    if args.batch is not None:
+        policy = read_policy(args.pattern_files)
+        batch_analyser: BatchAnalyser
+        if args.jobs > 1 or args.timeout is not None:
+            batch_analyser = ParallelBatchAnalyser(
+                Analyser(policy, args.mode, make_budget(args)),
+                OutputWriter(output_format=args.format),
+                result_cache=make_result_cache(args),
+                write_stats=args.stats or args.profile,
+                trace_allocations=args.profile,
+                jobs=args.jobs,
+                timeout=args.timeout,
+            )
+        else:
+            batch_analyser = BatchAnalyser(
+                Analyser(policy, args.mode, make_budget(args)),
+                OutputWriter(output_format=args.format),
+                result_cache=make_result_cache(args),
+                write_stats=args.stats or args.profile,
+                trace_allocations=args.profile,
+            )
+        try:
+            results = batch_analyser.run(BatchAnalyser.find_slices(args.batch))
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        sys.exit(1 if any(result.is_failed() for result in results) else 0)
+
+    stats = AnalysisStats()
+    if args.profile:
+        tracemalloc.start()
+    start = time.perf_counter()
 
     # Read Python slice and generate ast
     tree = None
     try:
-        with open(SLICE_PATH, "r") as f:
+        with open(args.slice, "r") as f:
             slice = f.read()
+        with stats.measure("parse"):
             tree = ast.parse(slice)
     except FileNotFoundError:
         print("Slice file not found", file=sys.stderr)
         sys.exit(1)
 
-    # Read patterns and create policy
-    policy = None
-    try:
-        with open(PATTERN_PATH, "r") as f:
-            patterns_json = json.load(f)
-            patterns = set()
-            for pattern in patterns_json:
-                patterns.add(Pattern.from_json(pattern))
-            policy = Policy(patterns)
-    except FileNotFoundError:
-        print("Pattern file not found", file=sys.stderr)
-        sys.exit(1)
-
-    control_flow_node_counter = ControlFlowNodeCounter()
-    control_flow_node_counter.visit(tree)
-
-    branches = list(itertools.product(
-        [(False, 1)] + [(True, i + 1) for i in range(3)],
-        repeat=control_flow_node_counter.get_count(),
-    ))
-    trees = []
+    if args.connect is not None:
+        try:
+            client = AnalysisClient(args.connect)
+            policy_id = client.load_policy(read_patterns([args.patterns]))
+            illegal_flows, partial = client.analyse(
+                policy_id, source=slice, mode=args.mode
+            )
+            client.close()
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"Analysis server error: {e}", file=sys.stderr)
+            sys.exit(1)
+        if partial is not None:
+            print(f"Partial analysis: {partial}", file=sys.stderr)
+        try:
+            OutputWriter(output_format=args.format).write(
+                args.slice, illegal_flows, args.output
+            )
+        except BrokenPipeError:
+            exit_on_broken_pipe()
+        sys.exit(0)
 
-    # Remove if statements from tree
-    for branch in branches:
-        control_flow_transformer = ControlFlowTransformer(branch)
-        tree_copy = deepcopy(tree)
-        control_flow_transformer.visit(tree_copy)
-        trees.append(tree_copy)
-
-    illegal_flows = set()
-    vulnerabilities = Vulnerabilities(policy)
-
-    trees = [tree] if len(trees) == 0 else trees
+    # Read patterns and create policy
+    policy = read_policy([args.patterns])
 
-    for i, tree in enumerate(trees):
-        # Find uninitialized variables
-        uninitialized_variable_detector = UninitializedVariableDetector()
-        uninitialized_variable_detector.visit(tree)
+    result_cache = make_result_cache(args)
+    output_writer = OutputWriter(output_format=args.format)
+    try:
+        if args.format == "jsonl":
+            with output_writer.stream(args.slice, args.output) as json_lines_writer:
+                illegal_flows, cached = analyse_slice(
+                    tree, policy, args, stats, result_cache, json_lines_writer.write
+                )
+                elapsed = time.perf_counter() - start
+                json_lines_writer.write(illegal_flows)
+        else:
+            illegal_flows, cached = analyse_slice(
+                tree, policy, args, stats, result_cache
+            )
+            elapsed = time.perf_counter() - start
+            output_writer.write(args.slice, illegal_flows, args.output)
+    except BrokenPipeError:
+        exit_on_broken_pipe()
 
-        # Find illegal flows
-        vulnerabilities_copy = deepcopy(vulnerabilities)
-        nodeProcessor = NodeProcessor(
-            vulnerabilities_copy, uninitialized_variable_detector
-        )
-        nodeProcessor.visit(tree)
-
-        for illegal_flow in vulnerabilities_copy.get_illegal_flows():
-            illegal_flows.add(illegal_flow)
-
-    illegal_flows = list(illegal_flows)
-
-    # Combine illegal flows
-    combined_flows = []
-    combined_flows_indices = []
-    for i in range(len(illegal_flows)):
-        for j in range(i + 1, len(illegal_flows)):
-            if illegal_flows[i].is_combinable(illegal_flows[j]):
-                combined_flows.append(illegal_flows[i].combine(illegal_flows[j]))
-                combined_flows_indices += [i, j]
-
-    # Remove combined flows from the original list
-    for i in sorted(combined_flows_indices, reverse=True):
-        del illegal_flows[i]
-
-    # Add combined flows to the original list
-    illegal_flows.extend(combined_flows)
-
-    # Transform illegal flows to JSON
-    for i in range(len(illegal_flows)):
-        illegal_flows[i] = illegal_flows[i].to_json()
-
-    OUTPUT_FILE = f"output/{SLICE_NAME}.output.json"
-    if not os.path.exists("output"):
-        os.makedirs("output")
-    with open(OUTPUT_FILE, "w") as f:
-        f.write(json.dumps(illegal_flows, indent=4) + "\n")
+    output_writer.write_partial(args.slice, stats)
+    if args.stats or args.profile:
+        fields = {"mode": args.mode, "elapsed": elapsed, "cached": cached}
+        if result_cache is not None:
+            fields["cache"] = result_cache.get_stats()
+        output_writer.write_stats(args.slice, stats, **fields)
@@ -0,0 +1,85 @@
+import ast
+from typing import List, Tuple
+
+
+class ControlFlowFlattener(ast.NodeVisitor):
+    """
+    Specialises a tree to a combination of branches without copying it
+
+    Visiting the tree returns the sequence of statements executed by the
+    combination, where each if and while statement is replaced by the
+    statements of the chosen branch. The statements are the nodes of the
+    original tree, so they must not be modified.
+    """
+
+    def __init__(self, branches: Tuple[Tuple[bool, int], ...]) -> None:
+        self.branches = branches
+        self.index = 0
+
+    @staticmethod
+    def get_control_flow_nodes(stmts: List[ast.stmt]) -> List[ast.stmt]:
+        """
+        Returns the if and while statements in the order their branches are
+        taken from the combination
+        """
+        nodes = []
+        for stmt in stmts:
+            if isinstance(stmt, (ast.If, ast.While)):
+                nodes += ControlFlowFlattener.get_control_flow_branch_nodes(
+                    stmt.body + stmt.orelse
+                )
+                nodes.append(stmt)
+        return nodes
+
+    @staticmethod
+    def get_control_flow_branch_nodes(stmts: List[ast.stmt]) -> List[ast.stmt]:
+        nodes = []
+        for stmt in stmts:
+            if isinstance(stmt, ast.If):
+                nodes += ControlFlowFlattener.get_control_flow_branch_nodes(
+                    stmt.body + stmt.orelse
+                )
+                nodes.append(stmt)
+        return nodes
+
+    def visit_Module(self, node) -> List[ast.stmt]:
+        stmts = []
+        for stmt in node.body:
+            if isinstance(stmt, (ast.If, ast.While)):
+                stmts += self.visit(stmt)
+            else:
+                stmts.append(stmt)
+        return stmts
+
+    def visit_branch(self, stmts: List[ast.stmt]) -> List[ast.stmt]:
+        flattened = []
+        for stmt in stmts:
+            if isinstance(stmt, ast.If):
+                flattened += self.visit(stmt)
+            else:
+                flattened.append(stmt)
+        return flattened
+
+    def visit_If(self, node) -> List[ast.stmt]:
+        true_stmt = self.visit_branch(node.body)
+        false_stmt = self.visit_branch(node.orelse)
+
+        branch, _ = self.branches[self.index]
+        self.index += 1
+
+        if branch:
+            return true_stmt
+        else:
+            return false_stmt
+
+    def visit_While(self, node) -> List[ast.stmt]:
+        true_stmt = self.visit_branch(node.body)
+        false_stmt = self.visit_branch(node.orelse)
+
+        branch, repeat = self.branches[self.index]
+        self.index += 1
+
+        if branch:
+            return true_stmt * repeat
+        else:
+            return false_stmt
@@ -0,0 +1,100 @@
+import ast
+from typing import List, Tuple
+
+from domain.MultiLabel import MultiLabel
+from domain.MultiLabelling import MultiLabelling
+from domain.Vulnerabilities import Vulnerabilities
+
+from visitors.NodeProcessor import NodeProcessor
+from visitors.UninitializedVariableDetector import UninitializedVariableDetector
+
+
+State = Tuple[MultiLabelling, UninitializedVariableDetector]
+
+
+class FixpointProcessor(NodeProcessor):
+    """
+    Processes the original tree once instead of once per branch combination
+
+    The multi-labellings of both branches of an if statement are joined, and
+    the body of a while loop is processed until its multi-labelling stops
+    changing. Initialized variables are tracked along the way, so a variable
+    is uninitialized if it is uninitialized in any of the joined branches.
+
+    The illegal flows found include the ones of every combination of
+    branches of the "paths" mode, but may have more sanitized flows and
+    more sources and sinks: the joined labels stand for all the branches at
+    once, and loops are iterated beyond three repetitions.
+    """
+
+    def __init__(self, vulnerabilities: Vulnerabilities) -> None:
+        super().__init__(vulnerabilities, UninitializedVariableDetector())
+
+    def get_state(self) -> State:
+        return (
+            self.vulnerabilities.get_multilabelling(),
+            self.uninitialized_variable_detector,
+        )
+
+    def set_state(self, state: State) -> None:
+        multilabelling, uninitialized_variable_detector = state
+        self.vulnerabilities.set_multilabelling(multilabelling)
+        self.uninitialized_variable_detector = uninitialized_variable_detector
+
+    def fork_state(self, state: State) -> State:
+        multilabelling, uninitialized_variable_detector = state
+        return (multilabelling.fork(), uninitialized_variable_detector.copy())
+
+    def join_states(self, state: State, other: State) -> State:
+        return (state[0].join(other[0]), state[1].join(other[1]))
+
+    def add_sources(
+        self, multi_label_func: MultiLabel, multi_label_args: MultiLabel
+    ) -> MultiLabel:
+        """
+        Keeps the flows of a called function from the sources of its
+        arguments, which are then added by combining both multi-labels. After
+        a join, the arguments may carry sources that reach the call only on
+        some branches, where the flows of the function are not dropped.
+        """
+        return multi_label_func
+
+    def visit_stmts(self, stmts: List[ast.stmt]) -> None:
+        for stmt in stmts:
+            if not isinstance(stmt, (ast.If, ast.While)):
+                # variables assigned by the statement are initialized in it
+                self.uninitialized_variable_detector.visit(stmt)
+            self.visit(stmt)
+
+    def visit_Module(self, node):
+        self.visit_stmts(node.body)
+
+    def visit_If(self, node):
+        entry = self.fork_state(self.get_state())
+
+        self.visit_stmts(node.body)
+        body_exit = self.get_state()
+
+        self.set_state(entry)
+        self.visit_stmts(node.orelse)
+
+        self.set_state(self.join_states(body_exit, self.get_state()))
+
+    def visit_While(self, node):
+        entry = self.fork_state(self.get_state())
+
+        # states after one or more iterations of the body
+        self.visit_stmts(node.body)
+        loop_exit = self.get_state()
+        while True:
+            self.set_state(self.fork_state(loop_exit))
+            self.visit_stmts(node.body)
+            next_exit = self.join_states(loop_exit, self.get_state())
+            if next_exit == loop_exit:
+                break
+            loop_exit = next_exit
+
+        self.set_state(entry)
+        self.visit_stmts(node.orelse)
+
+        self.set_state(self.join_states(loop_exit, self.get_state()))
@@ -0,0 +1,140 @@
+import ast
+from typing import List, Set, Tuple
+
+from domain.Policy import Policy
+
+from visitors.UninitializedVariableDetector import UninitializedVariableDetector
+
+
+class IrrelevantBlockDetector(ast.NodeVisitor):
+    """
+    Searches for if and while statements whose branches cannot change the
+    illegal flows of a slice
+
+    A statement is relevant if it reaches a sink, or if it changes the label
+    or the initialization of an identifier read by a relevant statement. The
+    statements of an irrelevant block are all irrelevant, so any branch of
+    the block and of the control flow statements inside it leads to the same
+    illegal flows. Conditions are not analysed, so they are ignored.
+
+    Reading a variable changes its label when it is a source, or when it may
+    be uninitialized: when no top-level statement, which is on every path,
+    initializes it before.
+    """
+
+    def __init__(self, policy: Policy) -> None:
+        self.policy = policy
+        self.uninitialized_variable_detector = UninitializedVariableDetector()
+        # identifiers read by the statement being visited, by kind: "name",
+        # "func" (name of a called function), "attr" or "key" (attribute of a
+        # variable)
+        self.reads: Set[Tuple[str, str]] = set()
+        # identifiers whose "label" or "init" the statement may change, and
+        # the "sink"s it reaches
+        self.writes: Set[Tuple[str, str]] = set()
+        self.statements: List[
+            Tuple[ast.stmt, Set[Tuple[str, str]], Set[Tuple[str, str]]]
+        ] = []
+        self.blocks: List[ast.stmt] = []
+
+    def visit_Module(self, node):
+        self.uninitialized_variable_detector.visit_stmts(
+            [
+                stmt
+                for stmt in node.body
+                if not isinstance(stmt, (ast.If, ast.While))
+            ]
+        )
+        self.visit_stmts(node.body)
+
+    def visit_stmts(self, stmts: List[ast.stmt]) -> None:
+        for stmt in stmts:
+            if isinstance(stmt, (ast.If, ast.While)):
+                self.blocks.append(stmt)
+                self.visit_stmts(stmt.body + stmt.orelse)
+            else:
+                self.reads, self.writes = set(), set()
+                self.visit(stmt)
+                self.statements.append((stmt, self.reads, self.writes))
+
+    def visit_identifier(self, kind: str, identifier: str) -> None:
+        self.reads.add((kind, identifier))
+        if len(self.policy.get_patterns_with_sink(identifier)) > 0:
+            self.writes.add(("sink", identifier))
+
+    def visit_Name(self, node):
+        self.visit_identifier("name", node.id)
+
+        if isinstance(node.ctx, ast.Store):
+            self.writes.add(("label", node.id))
+            self.writes.add(("init", node.id))
+        elif len(
+            self.policy.get_patterns_with_source(node.id)
+        ) > 0 or self.uninitialized_variable_detector.is_uninitialized(
+            node.id, node.lineno
+        ):
+            self.writes.add(("label", node.id))
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name):
+            # called functions are initialized by the call
+            self.visit_identifier("func", node.func.id)
+            self.writes.add(("init", node.func.id))
+            if len(self.policy.get_patterns_with_source(node.func.id)) > 0:
+                self.writes.add(("label", node.func.id))
+        else:
+            self.visit(node.func)
+
+        for arg in node.args:
+            self.visit(arg)
+        for keyword in node.keywords:
+            self.visit(keyword)
+
+    def visit_Attribute(self, node):
+        self.visit(node.value)
+
+        self.visit_identifier("attr", node.attr)
+        self.writes.add(("init", node.attr))
+        if isinstance(node.value, ast.Name):
+            key = node.value.id + "." + node.attr
+            self.visit_identifier("key", key)
+            self.writes.add(("label", key))
+
+    def get_relevant_statements(self) -> Set[ast.stmt]:
+        relevant_statements = set()
+        # identifiers whose label or initialization relevant statements read
+        relevant_writes: Set[Tuple[str, str]] = set()
+
+        changed = True
+        while changed:
+            changed = False
+            for stmt, reads, writes in self.statements:
+                if stmt in relevant_statements:
+                    continue
+                if not any(
+                    kind == "sink" or (kind, identifier) in relevant_writes
+                    for kind, identifier in writes
+                ):
+                    continue
+
+                relevant_statements.add(stmt)
+                for kind, identifier in reads:
+                    if kind in ("name", "func", "key"):
+                        relevant_writes.add(("label", identifier))
+                    if kind == "name":
+                        relevant_writes.add(("init", identifier))
+                changed = True
+
+        return relevant_statements
+
+    def get_irrelevant_blocks(self) -> Set[ast.stmt]:
+        """
+        Returns the irrelevant if and while statements of the visited slice,
+        including the ones inside other irrelevant blocks
+        """
+        relevant_statements = self.get_relevant_statements()
+        return {
+            block
+            for block in self.blocks
+            if not any(node in relevant_statements for node in ast.walk(block))
+        }
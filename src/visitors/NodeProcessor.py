@@ -1,16 +1,26 @@
 import ast
-from typing import Set
+from typing import Collection, List
+
 from domain.Flow import Flow
 from domain.IllegalFlow import IllegalFlow
-
-from domain.Variable import Variable
+from domain.MultiLabel import MultiLabel
+from domain.Pattern import Pattern
+from domain.Sink import Sink
+from domain.Source import Source
 from domain.Vulnerabilities import Vulnerabilities
 
-from visitors.NodeLabeler import NodeLabeler
 from visitors.UninitializedVariableDetector import UninitializedVariableDetector
 
 
 class NodeProcessor(ast.NodeVisitor):
+    """
+    Processes the statements of a slice, updating the multi-labels of the
+    variables and collecting the illegal flows that reach sinks
+
+    Visiting an expression returns its multi-label, which is computed once,
+    bottom-up, and reused for assignments, sinks and sanitizers.
+    """
+
     def __init__(
         self,
         vulnerabilities: Vulnerabilities,
@@ -19,23 +29,61 @@ class NodeProcessor(ast.NodeVisitor):
         self.vulnerabilities = vulnerabilities
         self.uninitialized_variable_detector = uninitialized_variable_detector
 
+    def visit_stmts(self, stmts: List[ast.stmt]) -> None:
+        for stmt in stmts:
+            self.visit(stmt)
+
+    def visit_Expr(self, node):
+        return self.visit(node.value)
+
+    def visit_Constant(self, node):
+        return MultiLabel()
+
     def visit_Name(self, node):
-        # add multi-label
-        nodeLabel = NodeLabeler(
-            self.vulnerabilities, self.uninitialized_variable_detector
-        )
-        self.vulnerabilities.add_multi_label(nodeLabel.visit(node), node.id)
+        multi_label = self.vulnerabilities.get_multi_label(node.id)
 
-    def visit_Call(self, node):
-        self.visit(node.func)
-        for arg in node.args:
-            self.visit(arg)
+        # mark name as source
+        if self.uninitialized_variable_detector.is_uninitialized(
+            node.id, node.lineno
+        ):
+            patterns = self.vulnerabilities.get_patterns()
+        elif isinstance(node.ctx, ast.Load):
+            patterns = self.vulnerabilities.get_patterns_with_source(node.id)
+        else:
+            patterns = []
 
-        node_labeler = NodeLabeler(
-            self.vulnerabilities, self.uninitialized_variable_detector
+        multi_label = multi_label.combine(
+            self.source_multi_label(node.id, node.lineno, patterns)
         )
-        func_multi_label = node_labeler.visit(node)
 
+        self.vulnerabilities.add_multi_label(multi_label, node.id)
+        return multi_label
+
+    def visit_BinOp(self, node):
+        return self.visit(node.left).combine(self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        return self.visit(node.operand)
+
+    def visit_BoolOp(self, node):
+        multi_label_values = MultiLabel()
+        for value in node.values:
+            multi_label_values = multi_label_values.combine(self.visit(value))
+
+        return multi_label_values
+
+    def visit_Compare(self, node):
+        multi_label_left = self.visit(node.left)
+
+        multi_label_comparators = MultiLabel()
+        for comparator in node.comparators:
+            multi_label_comparators = multi_label_comparators.combine(
+                self.visit(comparator)
+            )
+
+        return multi_label_left.combine(multi_label_comparators)
+
+    def visit_Call(self, node):
         if isinstance(node.func, ast.Name):
             func_id = node.func.id
         elif isinstance(node.func, ast.Attribute):
@@ -43,46 +91,69 @@ class NodeProcessor(ast.NodeVisitor):
         else:
             raise NotImplementedError
 
+        multi_label_func = self.visit(node.func)
+
+        multi_label_args = MultiLabel()
+        for arg in node.args:
+            multi_label_args = multi_label_args.combine(self.visit(arg))
+
+        # add sources, whose flows start again at the call
+        multi_label_func = self.add_sources(multi_label_func, multi_label_args)
+
+        # combine multi-label of function with multi-label of arguments
+        multi_label_func = multi_label_func.combine(multi_label_args)
+
+        # add sanitizers
+        patterns = self.vulnerabilities.get_patterns_with_sanitizer(func_id)
+        if len(patterns) > 0:
+            label_encoding = self.vulnerabilities.get_label_encoding()
+            multi_label_func = label_encoding.add_sanitizer(
+                multi_label_func, func_id, node.lineno, patterns
+            )
+
         # add sinks
-        for pattern in self.vulnerabilities.get_patterns():
-            if pattern.has_sink(func_id):
-                label = func_multi_label.get_label(pattern)
-                for source, source_lineno in label.get_sources():
-                    if node.func.id == source:
-                        continue
-                    flows = list(label.get_flows_from_source(source))
-                    if len(flows) == 0:
-                        continue
-                    self.vulnerabilities.add_illegal_flow(
-                        IllegalFlow(
-                            pattern.get_vulnerability(),
-                            source,
-                            source_lineno,
-                            func_id,
-                            node.lineno,
-                            Flow() in flows,
-                            [] if len(flows) == 0 else flows,
-                        )
-                    )
+        for pattern in self.vulnerabilities.get_patterns_with_sink(func_id):
+            self.add_illegal_flows(pattern, multi_label_func, func_id, node.lineno)
+
+        return multi_label_func
 
     def visit_Attribute(self, node):
-        nodeLabel = NodeLabeler(
-            self.vulnerabilities, self.uninitialized_variable_detector
+        multi_label_name = self.vulnerabilities.get_multi_label(node.value.id)
+        multi_label_attr = self.vulnerabilities.get_multi_label(
+            node.value.id + "." + node.attr
+        )
+
+        multi_label = multi_label_name.combine(multi_label_attr)
+
+        # mark name as source
+        if self.uninitialized_variable_detector.is_uninitialized(
+            node.value.id, node.lineno
+        ):
+            patterns = self.vulnerabilities.get_patterns()
+        elif isinstance(node.value.ctx, ast.Load):
+            patterns = self.vulnerabilities.get_patterns_with_source(node.value.id)
+        else:
+            patterns = []
+        multi_label = multi_label.combine(
+            self.source_multi_label(node.value.id, node.lineno, patterns)
         )
+
+        # mark attribute as source
+        if isinstance(node.ctx, ast.Load):
+            patterns = self.vulnerabilities.get_patterns_with_source(node.attr)
+            multi_label = multi_label.combine(
+                self.source_multi_label(node.attr, node.lineno, patterns)
+            )
+
         self.vulnerabilities.add_multi_label(
-            nodeLabel.visit(node), node.value.id + "." + node.attr
+            multi_label, node.value.id + "." + node.attr
         )
+        return multi_label
 
     def visit_Assign(self, node):
-        self.visit(node.value)
-        for target in node.targets:
-            self.visit(target)
+        value_multi_label = self.visit(node.value)
 
         # the multi-labels of the targets are the labels of the value
-        node_label = NodeLabeler(
-            self.vulnerabilities, self.uninitialized_variable_detector
-        )
-        value_multi_label = node_label.visit(node.value)
         for target in node.targets:
             if isinstance(target, ast.Name):
                 target_id = target.id
@@ -93,60 +164,90 @@ class NodeProcessor(ast.NodeVisitor):
             self.vulnerabilities.add_multi_label(value_multi_label, target_id)
 
         # add sinks
-        for pattern in self.vulnerabilities.get_patterns():
-            for target in node.targets:
-                if isinstance(target, ast.Name):
-                    if pattern.has_sink(target.id):
-                        label = self.vulnerabilities.get_multi_label(
-                            target_id
-                        ).get_label(pattern)
-                        for source, source_lineno in label.get_sources():
-                            if target_id == source:
-                                continue
-                            flows = list(label.get_flows_from_source(source))
-                            if len(flows) == 0:
-                                continue
-                            self.vulnerabilities.add_illegal_flow(
-                                IllegalFlow(
-                                    pattern.get_vulnerability(),
-                                    source,
-                                    source_lineno,
-                                    target_id,
-                                    node.lineno,
-                                    Flow() in flows,
-                                    [] if len(flows) == 0 else flows,
-                                )
-                            )
-                elif isinstance(target, ast.Attribute):
-                    if pattern.has_sink(target.value.id) or pattern.has_sink(
-                        target.attr
-                    ):
-                        label = self.vulnerabilities.get_multi_label(
-                            target.value.id + "." + target.attr
-                        ).get_label(pattern)
-                        for source, source_lineno in label.get_sources():
-                            flows = list(label.get_flows_from_source(source))
-                            if len(flows) == 0:
-                                continue
-                            target_id = (
-                                target.value.id
-                                if pattern.has_sink(target.value.id)
-                                else target.attr
-                            )
-                            self.vulnerabilities.add_illegal_flow(
-                                IllegalFlow(
-                                    pattern.get_vulnerability(),
-                                    source,
-                                    source_lineno,
-                                    target_id,
-                                    node.lineno,
-                                    Flow() in flows,
-                                    [] if len(flows) == 0 else flows,
-                                )
-                            )
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                for pattern in self.vulnerabilities.get_patterns_with_sink(target.id):
+                    self.add_illegal_flows(
+                        pattern,
+                        value_multi_label,
+                        target.id,
+                        node.lineno,
+                    )
+            elif isinstance(target, ast.Attribute):
+                patterns = set(
+                    self.vulnerabilities.get_patterns_with_sink(target.value.id)
+                ).union(self.vulnerabilities.get_patterns_with_sink(target.attr))
+                for pattern in patterns:
+                    self.add_illegal_flows(
+                        pattern,
+                        value_multi_label,
+                        (
+                            target.value.id
+                            if pattern.has_sink(target.value.id)
+                            else target.attr
+                        ),
+                        node.lineno,
+                        skip_sink_source=False,
+                    )
 
     def visit_If(self, node):
         raise ValueError
 
     def visit_While(self, node):
         raise ValueError
+
+    def add_sources(
+        self, multi_label_func: MultiLabel, multi_label_args: MultiLabel
+    ) -> MultiLabel:
+        """
+        Returns the multi-label of a called function with the sources of its
+        arguments, dropping its flows from those sources
+        """
+        return self.vulnerabilities.get_label_encoding().add_sources(
+            multi_label_func, multi_label_args
+        )
+
+    def source_multi_label(
+        self, source: Source, lineno: int, patterns: Collection[Pattern]
+    ) -> MultiLabel:
+        """
+        Returns the multi-label of a source of the given patterns
+        """
+        if len(patterns) == 0:
+            return MultiLabel()
+
+        return self.vulnerabilities.get_label_encoding().source_multi_label(
+            source, lineno, patterns
+        )
+
+    def add_illegal_flows(
+        self,
+        pattern: Pattern,
+        multi_label: MultiLabel,
+        sink: Sink,
+        lineno: int,
+        skip_sink_source: bool = True,
+    ) -> None:
+        """
+        Adds an illegal flow from each source of the pattern in the
+        multi-label to the sink. Unless skip_sink_source is False, as for
+        attribute targets, a source named like the sink is skipped.
+        """
+        label_encoding = self.vulnerabilities.get_label_encoding()
+        for source, source_lineno in label_encoding.get_sources(multi_label, pattern):
+            if skip_sink_source and sink == source:
+                continue
+            flows = label_encoding.get_flows_from_source(multi_label, pattern, source)
+            if len(flows) == 0:
+                continue
+            self.vulnerabilities.add_illegal_flow(
+                IllegalFlow(
+                    pattern.get_vulnerability(),
+                    source,
+                    source_lineno,
+                    sink,
+                    lineno,
+                    Flow() in flows,
+                    flows,
+                )
+            )
@@ -1,5 +1,5 @@
 import ast
-from typing import Dict, Set
+from typing import Dict, FrozenSet, List, Set, Tuple
 
 from domain.Variable import Variable
 
@@ -29,6 +29,10 @@ class UninitializedVariableDetector(ast.NodeVisitor):
             self.initialized[variable] = lineno
         self.initialized[variable] = min(self.initialized[variable], lineno)
 
+    def visit_stmts(self, stmts: List[ast.stmt]) -> None:
+        for stmt in stmts:
+            self.visit(stmt)
+
     def visit_Name(self, node):
         self.variables.add(node.id)
 
@@ -51,3 +55,37 @@ class UninitializedVariableDetector(ast.NodeVisitor):
         # attributes are always initialized
         self.variables.add(node.attr)
         self.add_initialized(node.attr, node.lineno)
+
+    def copy(self) -> "UninitializedVariableDetector":
+        detector = UninitializedVariableDetector()
+        detector.variables = set(self.variables)
+        detector.initialized = dict(self.initialized)
+        return detector
+
+    def get_key(self) -> FrozenSet[Tuple[Variable, int]]:
+        """
+        Identifies the detectors that find the same uninitialized variables
+        as this one.
+        """
+        return frozenset(self.initialized.items())
+
+    def join(
+        self, other: "UninitializedVariableDetector"
+    ) -> "UninitializedVariableDetector":
+        """
+        Return a new detector where a variable is initialized only if it is
+        initialized in both detectors.
+        """
+        detector = UninitializedVariableDetector()
+        detector.variables = self.variables.union(other.variables)
+        for variable in self.initialized.keys() & other.initialized.keys():
+            detector.initialized[variable] = max(
+                self.initialized[variable], other.initialized[variable]
+            )
+        return detector
+
+    def __eq__(self, other) -> bool:
+        return (
+            self.variables == other.variables
+            and self.initialized == other.initialized
+        )
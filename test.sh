@@ -50,7 +50,7 @@ fi
 
 PASSED=0
 TOTAL=0
-for test_dir in $(ls -d "$TESTS_DIR"/T*); do
+for test_dir in $(ls -d "$TESTS_DIR"/T* 2>/dev/null); do
     TOTAL=$((TOTAL+1))
 
     SLICE=$(find "$test_dir" -type f -name '*.py')
@@ -83,3 +83,6 @@ for test_dir in $(ls -d "$TESTS_DIR"/T*); do
 done
 
 echo -e "\nPASSED: ${GREEN}$PASSED/$TOTAL${NC}"
+
+# differential tests of the analysis modes
+python3 -m unittest discover -s "$TESTS_DIR"
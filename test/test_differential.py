@@ -0,0 +1,232 @@
+"""
+Differential tests of the analysis modes on small random slices.
+
+The paths mode is the reference: the explore mode and the parallel analysis
+of the paths must find the same illegal flows, the fixpoint mode at least
+the same ones, and an incremental analysis of an edited slice the same ones
+as the fixpoint analysis of the whole slice.
+
+Usage: python3 -m unittest discover -s test
+"""
+
+import ast
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from domain.Policy import Policy  # noqa: E402
+
+from analysis.AnalysisBudget import AnalysisBudget  # noqa: E402
+from analysis.AnalysisStats import AnalysisStats  # noqa: E402
+from analysis.Analyser import Analyser  # noqa: E402
+from analysis.IncrementalAnalyser import IncrementalAnalyser  # noqa: E402
+from analysis.ParallelAnalyser import ParallelAnalyser  # noqa: E402
+
+PATTERNS = [
+    {
+        "vulnerability": "A",
+        "sources": ["src", "a"],
+        "sanitizers": ["san"],
+        "sinks": ["snk", "b"],
+        "implicit": "no",
+    },
+    {
+        "vulnerability": "B",
+        "sources": ["src2", "c"],
+        "sanitizers": ["san2", "san"],
+        "sinks": ["snk", "d.e"],
+        "implicit": "no",
+    },
+]
+
+VARIABLES = ["a", "b", "c", "d", "x", "y"]
+
+# slices per test, and the most control flow statements of each one
+SLICES = 40
+MAX_CONTROL_FLOW_NODES = 5
+
+
+class SliceGenerator:
+    """
+    Generates slices with if statements nested in the bodies of others, and
+    while statements at the top level, as the paths mode expects them
+    """
+
+    def __init__(self, seed: int) -> None:
+        self.random = random.Random(seed)
+
+    def expression(self, depth: int) -> str:
+        choice = self.random.random()
+        if depth == 0 or choice < 0.3:
+            return self.random.choice(
+                VARIABLES + ["src()", "src2()", "1", "d.e", "x.y"]
+            )
+        if choice < 0.6:
+            return f"{self.expression(depth - 1)} + {self.expression(depth - 1)}"
+        function = self.random.choice(["san", "san2", "f", "snk", "x", "y"])
+        return f"{function}({self.expression(depth - 1)})"
+
+    def statement(self) -> str:
+        if self.random.random() < 0.3:
+            return f"snk({self.expression(2)})"
+        target = self.random.choice(VARIABLES + ["d.e", "x.y"])
+        return f"{target} = {self.expression(2)}"
+
+    def block(self, statements: int, indent: str, depth: int) -> list:
+        lines = []
+        for _ in range(statements):
+            choice = self.random.random()
+            if choice < 0.25 and depth < 3:
+                body_indent = indent + "    "
+                lines.append(f"{indent}if {self.expression(0)}:")
+                lines += self.block(self.random.randint(1, 3), body_indent, depth + 1)
+                if self.random.random() < 0.7:
+                    lines.append(f"{indent}else:")
+                    lines += self.block(self.random.randint(1, 2), body_indent, 3)
+            elif choice < 0.35 and depth == 0:
+                lines.append(f"{indent}while {self.expression(0)}:")
+                lines += self.block(self.random.randint(1, 3), indent + "    ", 1)
+                if self.random.random() < 0.3:
+                    lines.append(f"{indent}else:")
+                    lines.append(f"{indent}    {self.statement()}")
+            else:
+                lines.append(indent + self.statement())
+        return lines
+
+    def generate(self) -> str:
+        return "\n".join(self.block(self.random.randint(3, 9), "", 0)) + "\n"
+
+
+def generate_slices(count: int = SLICES) -> list:
+    """
+    Returns count slices with at most MAX_CONTROL_FLOW_NODES control flow
+    statements, the same ones on every run
+    """
+    slices: List[str] = []
+    seed = 0
+    while len(slices) < count:
+        source = SliceGenerator(seed).generate()
+        seed += 1
+        tree = ast.parse(source)
+        if Analyser.count_control_flow_nodes(tree) <= MAX_CONTROL_FLOW_NODES:
+            slices.append(source)
+    return slices
+
+
+def analyse(analyser: Analyser, source: str) -> list:
+    illegal_flows = analyser.analyse(ast.parse(source))
+    return [illegal_flow.to_json() for illegal_flow in illegal_flows]
+
+
+class DifferentialTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.policy = Policy.from_json(PATTERNS)
+        self.slices = generate_slices()
+
+    def assertCovers(self, illegal_flows: list, expected: list, source: str) -> None:
+        """
+        Asserts that illegal_flows has every flow of the expected illegal
+        flows, between the same source and sink
+        """
+
+        def key(illegal_flow):
+            return str(
+                (
+                    illegal_flow["vulnerability"],
+                    illegal_flow["source"],
+                    illegal_flow["sink"],
+                )
+            )
+
+        found = {key(illegal_flow): illegal_flow for illegal_flow in illegal_flows}
+        for illegal_flow in expected:
+            other = found.get(key(illegal_flow))
+            self.assertIsNotNone(other, f"missing {illegal_flow} in\n{source}")
+            assert other is not None
+            if illegal_flow["unsanitized_flows"] == "yes":
+                self.assertEqual(other["unsanitized_flows"], "yes", source)
+            for flow in illegal_flow["sanitized_flows"]:
+                self.assertIn(flow, other["sanitized_flows"], source)
+
+    def test_explore_matches_paths(self) -> None:
+        for source in self.slices:
+            self.assertEqual(
+                analyse(Analyser(self.policy, "explore"), source),
+                analyse(Analyser(self.policy, "paths"), source),
+                source,
+            )
+
+    def test_fixpoint_covers_paths(self) -> None:
+        for source in self.slices:
+            self.assertCovers(
+                analyse(Analyser(self.policy, "fixpoint"), source),
+                analyse(Analyser(self.policy, "paths"), source),
+                source,
+            )
+
+    def test_parallel_matches_paths(self) -> None:
+        # the slices with the most paths, as each one starts a pool
+        slices = sorted(
+            self.slices,
+            key=lambda source: Analyser.count_control_flow_nodes(ast.parse(source)),
+        )[-4:]
+        for source in slices:
+            self.assertEqual(
+                analyse(ParallelAnalyser(self.policy, "paths", 2), source),
+                analyse(Analyser(self.policy, "paths"), source),
+                source,
+            )
+
+    def test_parallel_path_budget(self) -> None:
+        source = self.slices[0]
+        for slice_source in self.slices:
+            tree = ast.parse(slice_source)
+            if Analyser.count_control_flow_nodes(tree) == MAX_CONTROL_FLOW_NODES:
+                source = slice_source
+                break
+
+        for max_paths in (1, 10, 17):
+            stats = AnalysisStats()
+            analyser = ParallelAnalyser(
+                self.policy, "paths", 2, AnalysisBudget(max_paths=max_paths)
+            )
+            analyser.analyse(ast.parse(source), stats)
+            self.assertEqual(
+                stats.counters["paths"],
+                min(max_paths, stats.counters["total_paths"]),
+                source,
+            )
+
+    def test_incremental_matches_fixpoint(self) -> None:
+        with tempfile.TemporaryDirectory() as state_dir:
+            for i, source in enumerate(self.slices[:10]):
+                state_path = os.path.join(state_dir, f"{i}.state")
+                lines = source.splitlines()
+                edit = random.Random(i)
+                for _ in range(3):
+                    source = "\n".join(lines) + "\n"
+                    analyser = IncrementalAnalyser.load(state_path, self.policy)
+                    self.assertEqual(
+                        analyse(analyser, source),
+                        analyse(Analyser(self.policy, "fixpoint"), source),
+                        source,
+                    )
+                    analyser.save(state_path)
+
+                    # insert a statement, which moves the lines after it
+                    top_level = [
+                        index
+                        for index, line in enumerate(lines)
+                        if not line.startswith((" ", "else"))
+                    ]
+                    lines.insert(edit.choice(top_level), "a = src()")
+
+
+if __name__ == "__main__":
+    unittest.main()